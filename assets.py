@@ -0,0 +1,113 @@
+import mmap
+import os
+import struct
+import pygame
+from constants import *
+
+# Process-wide cache of decoded surfaces, keyed by (path, size, alpha)
+_images = {}
+# Cache of surfaces built in code rather than loaded from disk
+_generated = {}
+# Fonts keyed by (path, size)
+_fonts = {}
+# Number of times an image file was actually read from disk
+decode_count = 0
+
+def load_image(path, size=None, alpha=True):
+    """Return a converted (and optionally scaled) image shared by every caller.
+
+    The returned surface is shared, so callers must not draw onto it.
+    """
+    global decode_count
+    key = (path, size, alpha)
+    image = _images.get(key)
+    if image is not None:
+        return image
+
+    if size is None:
+        image = pygame.image.load(path)
+        decode_count += 1
+        image = image.convert_alpha() if alpha else image.convert()
+    else:
+        image = read_cached(path, size, alpha)
+        if image is None:
+            # Scale from the shared full-size image so each file is decoded once
+            image = pygame.transform.scale(load_image(path, None, alpha), size)
+            write_cached(path, size, alpha, image)
+
+    _images[key] = image
+    return image
+
+# Scaled images are also kept on disk as raw pixels, so new processes (such
+# as session workers) skip decoding and scaling the full-size PNGs. Each
+# blob records the source file's size and mtime and is rebuilt when the
+# source changes.
+CACHE_HEADER = struct.Struct("<4sHQQHH")  # magic, version, source mtime (ns), source size, width, height
+CACHE_MAGIC = b"MOAC"
+
+def cache_path(path, size, alpha):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(ASSET_CACHE_DIR, f"{name}-{size[0]}x{size[1]}-{'rgba' if alpha else 'rgb'}.raw")
+
+def read_cached(path, size, alpha):
+    """Return the cached, converted image, or None if there is no up-to-date blob"""
+    if not ASSET_CACHE_DIR:
+        return None
+    pixels = size[0] * size[1] * (4 if alpha else 3)
+    try:
+        source = os.stat(path)
+        f = open(cache_path(path, size, alpha), 'rb')
+    except OSError:
+        return None
+    with f:
+        # A truncated blob (or an empty one, which can't even be mapped) is just a miss
+        if os.fstat(f.fileno()).st_size != CACHE_HEADER.size + pixels:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header = CACHE_HEADER.unpack_from(data)
+            if header != (CACHE_MAGIC, ASSET_CACHE_VERSION, source.st_mtime_ns, source.st_size, *size):
+                return None
+            view = memoryview(data)[CACHE_HEADER.size:]
+            raw = pygame.image.frombuffer(view, size, "RGBA" if alpha else "RGB")
+            # Converting copies the pixels, so the map can be closed afterwards
+            image = raw.convert_alpha() if alpha else raw.convert()
+            del raw
+            view.release()
+    return image
+
+def write_cached(path, size, alpha, image):
+    if not ASSET_CACHE_DIR:
+        return
+    target = cache_path(path, size, alpha)
+    try:
+        source = os.stat(path)
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        # Written under a temporary name so other processes never read half a blob
+        temporary = f"{target}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC, ASSET_CACHE_VERSION, source.st_mtime_ns, source.st_size, *size))
+            f.write(pygame.image.tobytes(image, "RGBA" if alpha else "RGB"))
+        os.replace(temporary, target)
+    except OSError:
+        pass  # The cache is only an optimization
+
+def load_font(path, size):
+    """Return a font shared by every caller (path None is pygame's default font)"""
+    key = (path, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(path, size)
+    return font
+
+def get_surface(key, build):
+    """Return the generated surface for key, calling build() the first time"""
+    surface = _generated.get(key)
+    if surface is None:
+        surface = _generated[key] = build()
+    return surface
+
+def clear():
+    """Drop every cached surface (needed after the display is recreated)"""
+    _images.clear()
+    _generated.clear()
+    _fonts.clear()
@@ -0,0 +1,189 @@
+import random
+import numpy
+from constants import *
+from level_gen import LevelGenerator
+
+# Players move in steps of 5 pixels from a spawn point on the same 5 pixel
+# lattice, and the window edges are on it too, so every player and lava
+# position is a multiple of LATTICE. That lets each game's lava occupancy be
+# a small grid of lattice cells instead of a full-resolution mask.
+LATTICE = 5
+GRID_WIDTH = WINDOW_WIDTH // LATTICE
+GRID_HEIGHT = WINDOW_HEIGHT // LATTICE
+HITBOX_INSET = PLAYER_SIZE // 4  # Player.check_lava_collision shrinks the player by this on each side
+HITBOX_SIZE = PLAYER_SIZE - PLAYER_SIZE // 2
+# Lattice offsets, relative to a lava piece's top-left, of every hitbox top-left touching it
+REACH = numpy.arange(-((HITBOX_SIZE - 1) // LATTICE), (LAVA_SIZE - 1) // LATTICE + 1)
+GRACE = LAVA_GRACE_PIECES + 1  # Ring buffer size: the grace window plus the piece leaving it
+
+class BatchSimulation:
+    """Steps many games at once with the same rules as Simulation.step.
+
+    Every game is a row in a set of NumPy arrays, and one call to step()
+    advances all of them. Time always comes from the tick count.
+
+    Lava collisions use a per-game "danger" grid: when a piece leaves the
+    grace window, every lattice cell where the player's hitbox would touch
+    it is marked, so the per-tick check is a single lookup per game.
+    """
+    def __init__(self, spawns, walls, potions):
+        """spawns is a list of (x, y), walls and potions lists of position lists per game"""
+        n = len(spawns)
+        self.size = n
+        self.x = numpy.array([s[0] for s in spawns], dtype=numpy.int32)
+        self.y = numpy.array([s[1] for s in spawns], dtype=numpy.int32)
+        if (self.x % LATTICE).any() or (self.y % LATTICE).any():
+            raise ValueError(f"spawn positions must be multiples of {LATTICE}")
+
+        # Walls and potions, padded to the largest count, with validity flags
+        wall_count = max((len(w) for w in walls), default=0)
+        self.wall_x = numpy.zeros((n, wall_count), dtype=numpy.int32)
+        self.wall_y = numpy.zeros((n, wall_count), dtype=numpy.int32)
+        self.wall_valid = numpy.zeros((n, wall_count), dtype=bool)
+        for i, game_walls in enumerate(walls):
+            for j, (wx, wy) in enumerate(game_walls):
+                self.wall_x[i, j], self.wall_y[i, j] = wx, wy
+                self.wall_valid[i, j] = True
+
+        self.potion_x = numpy.zeros((n, 3), dtype=numpy.int32)
+        self.potion_y = numpy.zeros((n, 3), dtype=numpy.int32)
+        self.potion_alive = numpy.zeros((n, 3), dtype=bool)
+        for i, game_potions in enumerate(potions):
+            for j, (px, py) in enumerate(game_potions[:3]):
+                self.potion_x[i, j], self.potion_y[i, j] = px, py
+                self.potion_alive[i, j] = True
+
+        # Lava trail: piece count, the last GRACE pieces (ring buffer of
+        # player centers) and the danger grid of older pieces
+        self.lava_count = numpy.zeros(n, dtype=numpy.int64)
+        self.lava_ring_x = numpy.zeros((n, GRACE), dtype=numpy.int32)
+        self.lava_ring_y = numpy.zeros((n, GRACE), dtype=numpy.int32)
+        self.danger = numpy.zeros((n, GRID_HEIGHT, GRID_WIDTH), dtype=bool)
+
+        self.ticks = 0
+        self.lives = numpy.ones(n, dtype=numpy.int32)
+        self.stars_collected = numpy.zeros(n, dtype=numpy.int32)
+        self.game_over = numpy.zeros(n, dtype=bool)
+        self.won = numpy.zeros(n, dtype=bool)
+        self.elapsed_ms = numpy.zeros(n, dtype=numpy.float64)
+        self.invulnerable_timer = numpy.full(n, -1.0)  # Negative when not invulnerable
+
+    @classmethod
+    def from_simulations(cls, sims):
+        """Copy the starting state of fresh Simulation objects"""
+        return cls([sim.player.rect.topleft for sim in sims],
+                   [[wall.rect.topleft for wall in sim.walls] for sim in sims],
+                   [[potion.rect.topleft for potion in sim.potions] for sim in sims])
+
+    @classmethod
+    def new_games(cls, count, seed=None):
+        """Create count games, each on the first level of its own LevelGenerator"""
+        rng = random.Random(seed)
+        levels = [LevelGenerator(rng.getrandbits(63)).next_level() for _ in range(count)]
+        return cls([level[1] for level in levels],
+                   [level[0] for level in levels],
+                   [level[2] for level in levels])
+
+    @property
+    def finished(self):
+        return self.game_over | self.won
+
+    def step(self, inputs):
+        """Advance every unfinished game by one tick; inputs is one INPUT_* bitmask per game"""
+        inputs = numpy.asarray(inputs)
+        active = ~(self.game_over | self.won)
+        self.ticks += 1
+        self.elapsed_ms[active] = self.ticks * FIXED_TICK_MS
+
+        expired = active & (self.invulnerable_timer >= 0) & (self.elapsed_ms >= self.invulnerable_timer)
+        self.invulnerable_timer[expired] = -1.0
+
+        # Movement, clamped to the window
+        left = (inputs & INPUT_LEFT) != 0
+        right = (inputs & INPUT_RIGHT) != 0
+        up = (inputs & INPUT_UP) != 0
+        down = (inputs & INPUT_DOWN) != 0
+        moved = active & (left | right | up | down)
+        speed = 5
+        new_x = self.x + speed * (right.astype(numpy.int32) - left)
+        new_y = self.y + speed * (down.astype(numpy.int32) - up)
+        numpy.clip(new_x, 0, WINDOW_WIDTH - PLAYER_SIZE, out=new_x)
+        numpy.clip(new_y, 0, WINDOW_HEIGHT - PLAYER_SIZE, out=new_y)
+
+        # Moving into a wall cancels the whole move
+        hit_wall = (self.wall_valid
+                    & (new_x[:, None] < self.wall_x + WALL_SIZE) & (self.wall_x < new_x[:, None] + PLAYER_SIZE)
+                    & (new_y[:, None] < self.wall_y + WALL_SIZE) & (self.wall_y < new_y[:, None] + PLAYER_SIZE)).any(axis=1)
+        moved &= ~hit_wall
+        self.x = numpy.where(moved, new_x, self.x)
+        self.y = numpy.where(moved, new_y, self.y)
+
+        self._add_lava(moved & (self.invulnerable_timer < 0))
+        self._check_lava(active)
+        self._collect_potions(active)
+
+    def _add_lava(self, candidates):
+        """Append a lava piece where the player moved far enough from the last one"""
+        center_x = self.x + PLAYER_SIZE // 2
+        center_y = self.y + PLAYER_SIZE // 2
+        last = (self.lava_count - 1) % GRACE
+        rows = numpy.arange(self.size)
+        dx = center_x - self.lava_ring_x[rows, last]
+        dy = center_y - self.lava_ring_y[rows, last]
+        far = (dx * dx + dy * dy) > LAVA_SPACING * LAVA_SPACING
+        add = numpy.flatnonzero(candidates & ((self.lava_count == 0) | far))
+        if not len(add):
+            return
+
+        slot = self.lava_count[add] % GRACE
+        self.lava_ring_x[add, slot] = center_x[add]
+        self.lava_ring_y[add, slot] = center_y[add]
+        self.lava_count[add] += 1
+
+        # The piece leaving the grace window becomes dangerous
+        stamp = add[self.lava_count[add] > LAVA_GRACE_PIECES]
+        if not len(stamp):
+            return
+        old = (self.lava_count[stamp] - GRACE) % GRACE
+        # The ring holds piece centers; cells are indexed by top-left corner
+        cell_x = (self.lava_ring_x[stamp, old] - LAVA_SIZE // 2) // LATTICE
+        cell_y = (self.lava_ring_y[stamp, old] - LAVA_SIZE // 2) // LATTICE
+        cols = numpy.clip(cell_x[:, None] + REACH, 0, GRID_WIDTH - 1)
+        rows = numpy.clip(cell_y[:, None] + REACH, 0, GRID_HEIGHT - 1)
+        self.danger[stamp[:, None, None], rows[:, :, None], cols[:, None, :]] = True
+
+    def _check_lava(self, active):
+        """Lose a life where the player's hitbox touches an old lava piece"""
+        candidates = numpy.flatnonzero(active & (self.lava_count > LAVA_GRACE_PIECES))
+        if not len(candidates):
+            return
+        cell_x = (self.x[candidates] + HITBOX_INSET) // LATTICE
+        cell_y = (self.y[candidates] + HITBOX_INSET) // LATTICE
+        hit = candidates[self.danger[candidates, cell_y, cell_x]]
+        if not len(hit):
+            return
+
+        self.lives[hit] -= 1
+        dead = hit[self.lives[hit] <= 0]
+        self.game_over[dead] = True
+
+        # Survivors get a second of invulnerability and a fresh trail
+        survivors = hit[self.lives[hit] > 0]
+        self.invulnerable_timer[survivors] = self.elapsed_ms[survivors] + 1000
+        self.lava_count[survivors] = 0
+        self.danger[survivors] = False
+
+    def _collect_potions(self, active):
+        """Pick up potions whose collision rect the player overlaps"""
+        shrink = 15
+        size = POTION_SIZE - shrink * 2
+        px = self.potion_x + shrink
+        py = self.potion_y + shrink
+        x = self.x[:, None]
+        y = self.y[:, None]
+        touched = (self.potion_alive & active[:, None]
+                   & (x < px + size) & (px < x + PLAYER_SIZE)
+                   & (y < py + size) & (py < y + PLAYER_SIZE))
+        self.potion_alive &= ~touched
+        self.stars_collected += touched.sum(axis=1, dtype=numpy.int32)
+        self.won |= self.stars_collected >= 3
@@ -0,0 +1,363 @@
+"""Engine benchmarks.
+
+    python benchmark.py run [-o results.json] [--quick] [-k filter]
+    python benchmark.py compare baseline.json results.json [--threshold 0.15]
+
+Everything runs headless under the dummy SDL drivers. compare exits with
+status 1 if any benchmark got slower than the threshold allows.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+from constants import *
+
+BENCHMARKS = []
+
+def benchmark(function):
+    BENCHMARKS.append(function)
+    return function
+
+def measure(run, setup=None, repeat=7, number=None, budget=0.05):
+    """Time run() and return per-call statistics in microseconds.
+
+    setup() is called before every repeat and isn't timed; its result is
+    passed to run. number (calls per repeat) is picked to fill about budget
+    seconds when not given.
+    """
+    state = setup() if setup else None
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                run(state)
+            if time.perf_counter() - start >= budget / 10 or number >= 1 << 20:
+                break
+            number *= 2
+        number = max(1, int(number * budget / max(time.perf_counter() - start, 1e-9) / 10))
+
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup else state
+        start = time.perf_counter()
+        for _ in range(number):
+            run(state)
+        times.append((time.perf_counter() - start) / number * 1e6)
+    median = statistics.median(times)
+    return {'median_us': median, 'min_us': min(times), 'ops_per_s': 1e6 / median if median else None,
+            'calls': number * repeat}
+
+def new_game(mode, seed=1):
+    from game import Game
+    from leaderboard import NullScores
+    from level_gen import LevelGenerator
+
+    game = Game(screen=pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)), levels=LevelGenerator(seed), scores=NullScores())
+    game.mode = mode
+    game.state = "GAME"
+    game.reset_game()
+    return game
+
+def walk(tick):
+    """A square walk, so the lava trail keeps growing"""
+    return [INPUT_RIGHT, INPUT_DOWN, INPUT_LEFT, INPUT_UP][tick // 40 % 4]
+
+@benchmark
+def frame_loop(results, quick):
+    """One run_game frame (update and draw) in each mode"""
+    for mode in ("NORMAL", "BLIND", "WORLD", "HARD"):
+        game = new_game(mode)
+        # Hitting the trail only clears it, so no frame is spent on a reset
+        game.sim.lives = 10 ** 9
+        tick = [0]
+
+        def run(state):
+            game.update_game(walk(tick[0]))
+            game.draw_game()
+            tick[0] += 1
+        results[f"frame_loop.{mode}"] = measure(run, repeat=3 if quick else 7)
+
+@benchmark
+def lava_collision(results, quick):
+    """check_lava_collision with trails of 10 to 100k pieces"""
+    from simulation import PlayerBody
+
+    rng = random.Random(0)
+    for length in (10, 1000, 100000) if quick else (10, 100, 1000, 10000, 100000):
+        player = PlayerBody(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
+        for _ in range(length):
+            player.rect.center = (rng.randrange(WINDOW_WIDTH), rng.randrange(WINDOW_HEIGHT))
+            player.lava_trail.append((player.rect.centerx - LAVA_SIZE//2, player.rect.centery - LAVA_SIZE//2))
+            if len(player.lava_trail) > LAVA_GRACE_PIECES:
+                player.lava_mask.draw(player.lava_piece_mask, player.lava_trail[-LAVA_GRACE_PIECES - 1])
+        results[f"lava_collision.{length}"] = measure(lambda state: player.check_lava_collision())
+
+@benchmark
+def player_update(results, quick):
+    """Player movement against 10 to 1000 walls"""
+    from player import Player
+    from game_objects import Wall
+
+    rng = random.Random(0)
+    for count in (10, 1000) if quick else (10, 100, 1000):
+        walls = [Wall(rng.randrange(WINDOW_WIDTH), rng.randrange(WINDOW_HEIGHT)) for _ in range(count)]
+        player = Player(0, 0)
+        player.invulnerable = True  # Measure movement, not the trail
+        wall_rects = [wall.rect for wall in walls]
+        tick = [0]
+
+        def run(state):
+            player.move(walk(tick[0]), wall_rects)
+            tick[0] += 1
+        results[f"player_update.{count}"] = measure(run)
+
+@benchmark
+def wall_collision(results, quick):
+    """Player movement among 10 to 3000 walls, checking every wall and through the wall grid"""
+    from broadphase import WallGrid
+    from simulation import PlayerBody
+
+    rng = random.Random(0)
+    # The walk stays in this corner, so no move is blocked and every wall gets checked
+    path = pygame.Rect(0, 0, 200 + PLAYER_SIZE + 10, 200 + PLAYER_SIZE + 10)
+    for count in (10, 3000) if quick else (10, 100, 1000, 3000):
+        wall_rects = []
+        while len(wall_rects) < count:
+            rect = pygame.Rect(rng.randrange(WINDOW_WIDTH), rng.randrange(WINDOW_HEIGHT), WALL_SIZE, WALL_SIZE)
+            if not rect.colliderect(path):
+                wall_rects.append(rect)
+        grid = WallGrid(wall_rects)
+
+        for name, walls_near in (("scan", lambda rect: wall_rects),
+                                 ("grid", lambda rect: grid.query(rect.inflate(10, 10)))):
+            player = PlayerBody(0, 0)
+            player.invulnerable = True  # Measure movement, not the trail
+            tick = [0]
+
+            def run(state):
+                player.move(walk(tick[0]), walls_near(player.rect))
+                tick[0] += 1
+            results[f"wall_collision.{name}.{count}"] = measure(run)
+
+@benchmark
+def level_reset(results, quick):
+    """reset_game, and generating a level and its potions"""
+    from level_gen import LevelGenerator
+
+    game = new_game("NORMAL")
+    results["reset_game"] = measure(lambda state: game.reset_game(), repeat=3 if quick else 7)
+    generator = LevelGenerator(0)
+    results["level_gen.next_level"] = measure(lambda state: generator.next_level())
+    results["level_gen.next_level.hard"] = measure(lambda state: generator.next_level(hard=True))
+    blocked = [pygame.Rect(x, y, WALL_SIZE, WALL_SIZE) for x, y in generator.place_walls(())]
+    results["level_gen.place_potions"] = measure(lambda state: generator.place_potions(blocked))
+
+@benchmark
+def profiler_overhead(results, quick):
+    """Simulation.step with the frame profiler off and on"""
+    from profiling import profiler
+    from simulation import Simulation
+
+    for enabled in (False, True):
+        sim = Simulation.new_game(1)
+        sim.lives = 10 ** 9
+        tick = [0]
+
+        def run(state):
+            # Marks only count inside a frame, as in a session worker's tick
+            profiler.begin_frame()
+            sim.step(walk(tick[0]))
+            profiler.end_frame()
+            tick[0] += 1
+        profiler.enabled = enabled
+        results[f"simulation_step.profiler_{'on' if enabled else 'off'}"] = measure(run)
+    profiler.enabled = False
+
+@benchmark
+def env_step(results, quick):
+    """MoonEnv.step with state and pixel observations"""
+    from env import MoonEnv
+
+    for observation in ("state", "pixels"):
+        env = MoonEnv("NORMAL", observation)
+        env.reset(seed=1)
+        env.game.sim.lives = 10 ** 9  # Keep the episode going
+        tick = [0]
+
+        def run(state):
+            env.step(walk(tick[0]))
+            tick[0] += 1
+        results[f"env_step.{observation}"] = measure(run, repeat=3 if quick else 7)
+
+@benchmark
+def story(results, quick):
+    """draw_story on each page"""
+    game = new_game("NORMAL")
+    game.state = "STORY"
+    game.fade_speed = 0  # Keep the fade (the slowest part) on every frame
+    for page in range(len(STORY_TEXTS)):
+        game.story_page = page
+        results[f"draw_story.{page}"] = measure(lambda state: game.draw_story())
+
+@benchmark
+def asset_loading(results, quick):
+    """Loading the game's images and fonts with no cache, only the on-disk cache, and a warm cache"""
+    import assets
+
+    def cold():
+        assets.clear()
+        if ASSET_CACHE_DIR:
+            shutil.rmtree(ASSET_CACHE_DIR, ignore_errors=True)
+
+    def load(state):
+        assets.load_image("assets/background.png", (WINDOW_WIDTH, WINDOW_HEIGHT), alpha=False)
+        assets.load_image("assets/astronaut.png", (PLAYER_SIZE, PLAYER_SIZE))
+        assets.load_image("assets/lava.png", (LAVA_SIZE, LAVA_SIZE))
+        assets.load_image("assets/potion2.png", (POTION_SIZE, POTION_SIZE))
+        assets.load_font("assets/pixel_font.ttf", 24)
+
+    results["assets.cold"] = measure(load, setup=cold, repeat=5, number=1)
+    results["assets.disk"] = measure(load, setup=assets.clear, repeat=5, number=1)
+    results["assets.warm"] = measure(load)
+
+def first_frame():
+    """Start a game and draw its first frame, as a fresh process would"""
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    new_game("NORMAL").draw_game()
+
+@benchmark
+def startup(results, quick):
+    """A new process drawing its first frame, with and without the on-disk asset cache"""
+    command = [sys.executable, "-c", "import benchmark; benchmark.first_frame()"]
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def run(state):
+        subprocess.run(command, cwd=here, check=True, stdout=subprocess.DEVNULL)
+
+    def cold():
+        if ASSET_CACHE_DIR:
+            shutil.rmtree(os.path.join(here, ASSET_CACHE_DIR), ignore_errors=True)
+
+    repeat = 3 if quick else 5
+    results["first_frame.cold_cache"] = measure(run, setup=cold, repeat=repeat, number=1)
+    run(None)  # Leave the cache filled
+    results["first_frame.warm_cache"] = measure(run, repeat=repeat, number=1)
+
+def idle_screen(adaptive, seconds=1.0):
+    """Run the window loop on the mode select screen and print its CPU time and frame counts as JSON"""
+    from game import Game
+    from leaderboard import NullScores
+    from level_gen import LevelGenerator
+
+    pygame.init()
+    game = Game(levels=LevelGenerator(0), scores=NullScores())
+    game.state = "MODE"
+    game.adaptive_pacing = adaptive
+    game.draw_mode_select()  # Lay the screen out before timing
+    pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), loops=1)
+    start = time.process_time()
+    game.run()
+    print(json.dumps({'cpu_s': time.process_time() - start, 'frames': game.frame_counts}))
+
+@benchmark
+def idle_cpu(results, quick):
+    """CPU time of a second on a static screen, with fixed 60 FPS and with adaptive pacing"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    for adaptive in (False, True):
+        # Game.run ends with pygame.quit(), so it gets a process of its own
+        output = subprocess.run([sys.executable, "-c", f"import benchmark; benchmark.idle_screen({adaptive})"],
+                                cwd=here, check=True, capture_output=True, text=True).stdout
+        stats = json.loads(output.splitlines()[-1])
+        cpu_us = stats['cpu_s'] * 1e6
+        results[f"idle_cpu.mode_select.{'adaptive' if adaptive else 'fixed'}"] = {
+            'median_us': cpu_us, 'min_us': cpu_us, 'ops_per_s': None, 'calls': 1, 'frames': stats['frames']}
+        print(f"  {'adaptive' if adaptive else 'fixed'}: {stats}", file=sys.stderr)
+
+def run(quick=False, only=None):
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    results = {}
+    for function in BENCHMARKS:
+        if only and only not in function.__name__:
+            continue
+        print(f"{function.__name__}: {function.__doc__}", file=sys.stderr)
+        function(results, quick)
+    return {
+        'meta': {
+            'created_at': time.time(),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'quick': quick,
+        },
+        'results': results,
+    }
+
+def compare(baseline, current, threshold):
+    """Print a comparison table and return the names of regressed benchmarks.
+
+    Fastest repeats are compared, as they are the least disturbed by
+    whatever else the machine was doing.
+    """
+    regressions = []
+    print(f"{'benchmark':32} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, result in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:32} {'-':>12} {result['min_us']:12.1f}      new")
+            continue
+        change = result['min_us'] / base['min_us'] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:32} {base['min_us']:12.1f} {result['min_us']:12.1f} {change:+8.1%}{flag}")
+    for name in sorted(baseline['results'].keys() - current['results'].keys()):
+        print(f"{name:32} missing from the current results")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Moon Odyssey engine benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run the benchmarks and write JSON results")
+    run_parser.add_argument('-o', '--output', help="file to write (default: stdout)")
+    run_parser.add_argument('-k', dest='only', help="only run benchmarks whose name contains this")
+    run_parser.add_argument('--quick', action='store_true', help="fewer sizes and repeats")
+    compare_parser = commands.add_parser('compare', help="compare results with a saved baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15,
+                                help="slowdown (as a fraction) counted as a regression")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        output = json.dumps(run(args.quick, args.only), indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output + "\n")
+        else:
+            print(output)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from constants import *
+
+class WallGrid:
+    """Uniform grid over a level's wall rects, so a query only looks at walls in the cells it touches.
+
+    Walls never move, so the grid is built once per level. The player
+    stays in the same cells for many ticks in a row, so the walls of the
+    last query are kept and handed back while its cells don't change.
+    """
+    def __init__(self, rects, cell_size=BROADPHASE_CELL_SIZE):
+        self.rects = rects
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> indices of the walls touching that cell
+        for i, rect in enumerate(rects):
+            left, top, right, bottom = self.span(rect)
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    self.cells.setdefault((column, row), []).append(i)
+        self.last_span = None
+        self.last_walls = []
+
+    def span(self, rect):
+        """First and last column and row of the cells rect touches"""
+        size = self.cell_size
+        return rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size
+
+    def query(self, rect):
+        """Wall rects that may overlap rect: every wall sharing a cell with it, each once"""
+        span = self.span(rect)
+        if span != self.last_span:
+            left, top, right, bottom = span
+            indices = set()
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    indices.update(self.cells.get((column, row), ()))
+            self.last_span = span
+            self.last_walls = [self.rects[i] for i in sorted(indices)]
+        return self.last_walls
+
+    def collides(self, rect):
+        return rect.collidelist(self.query(rect)) != -1
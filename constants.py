@@ -1,5 +1,3 @@
-import pygame
-
 # Window settings
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
@@ -10,20 +8,101 @@ POTION_SIZE = 60
 WALL_SIZE = 40
 LAVA_SIZE = 30
 LAVA_SPACING = 20
+LAVA_GRACE_PIECES = 10  # Newest lava pieces the player can't collide with
+LAVA_TRAIL_COMPRESS = False  # Store straight runs of the lava trail as segments
+
+# Simulation
+FIXED_TICK_MS = 1000 / 60  # Length of one simulation tick
+
+# Game server
+SESSION_TICK_RATE = 60  # Ticks per second for hosted sessions
+MAX_TICK_BACKLOG = 5    # Ticks a worker may fall behind before skipping ahead
+STREAM_FPS = 20         # Frames per second captured for streamed sessions
+STREAM_FORMAT = "jpg"   # Image format of streamed frames
+STREAM_ENCODER_THREADS = 2  # Frame encoding threads per worker
+DELTA_TILE_SIZE = 40    # Side of the square tiles compared by the delta encoder
+DELTA_KEYFRAME_INTERVAL = 60  # Packets between full keyframes
+DELTA_FORMAT = "jpg"    # Image format of the changed tiles and keyframes ("png" is lossless)
+
+# Leaderboard
+LEADERBOARD_PATH = "scores.db"  # SQLite database of finish times
+LEADERBOARD_BATCH_SIZE = 500    # Most scores written in one transaction
+
+# Replays
+REPLAY_DIR = "replays"  # Where sessions record their replays (None to disable)
+REPLAY_MAX_TICKS = 60 * 60 * 30  # Longest replay accepted for verification (30 minutes)
+
+# Input bitmask for one tick
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
 
 # Game mechanics
 MIN_STAR_DISTANCE = 150  # Minimum distance between stars
 LIGHT_RADIUS = 100      # Size of light circle in normal mode
+LIGHT_FALLOFF = 0       # Width of the light circle's soft edge (0 for a hard edge)
 WALL_COUNT = 10         # Number of walls to create
 
+# Hard mode: WALL_COUNT walls plus obstacles along the edges and in clusters
+BORDER_OBSTACLES = 10
+CLUSTER_COUNT = 8
+OBSTACLES_PER_CLUSTER = 12
+BROADPHASE_CELL_SIZE = 80   # Side of the cells the wall grid sorts walls into
+
+# Level generation
+LEVEL_ATTEMPTS = 20     # Layouts tried before a level generator gives up
+LEVEL_POOL_SIZE = 8     # Levels generated ahead of time in the background
+
+# Large-world mode: a scrolling world of WORLD_CHUNK_SIZE square chunks,
+# generated as the player gets near them
+WORLD_CHUNK_SIZE = 200      # Divides the window size, so background tiles line up
+WORLD_CHUNKS_WIDE = 80      # 16000 x 12000 pixels: 400 screens
+WORLD_CHUNKS_HIGH = 60
+WORLD_WALLS_PER_CHUNK = 1   # Average; about the density of a normal level
+WORLD_STAR_DISTANCE = (600, 1500)  # Stars are placed this far from the spawn
+WORLD_ACTIVE_MARGIN = 1     # Chunks beyond the screen edge kept ready to draw
+
+# Modes with a leaderboard of finish times
+SCORED_MODES = ('NORMAL', 'BLIND', 'HARD')
+
+# Agent environments (env.py)
+ENV_MAX_TICKS = 60 * 120  # Steps before an episode is cut off
+ENV_GRID_CELL = 40      # Side of the cells of the wall and lava grids in state observations
+
+# Presentation
+DIRTY_RECT_MODE = False # Only send changed screen regions to the display
+ADAPTIVE_PACING = True  # Wait for input instead of redrawing screens where nothing moves
+IDLE_WAIT_MS = 250      # Longest wait for input on such a screen
+
+# Profiling
+PROFILER_FRAMES = 300   # Recent frames kept for percentiles
+PROFILE_WORKERS = True  # Time the phases of session worker ticks (exported at /metrics)
+
+# Caches
+TEXT_CACHE_SIZE = 256   # Rendered text surfaces kept by the text cache
+ASSET_CACHE_DIR = ".asset_cache"  # Scaled images kept on disk as raw pixels (None to disable)
+ASSET_CACHE_VERSION = 1  # Bump to ignore blobs written by older code
+
 # Game colors
 TEXT_COLOR_LOSE = (255, 150, 150)  # Red
 TEXT_COLOR_WIN = (150, 255, 150)   # Green
 BUTTON_COLOR = (70, 70, 70)        # Dark gray
 
+# Overlay darkness (255 is completely opaque)
+LIGHT_DARKNESS_ALPHA = 245  # Outside the light circle in normal mode
+BLIND_DARKNESS_ALPHA = 240  # Whole screen in blind mode
+DIM_OVERLAY_ALPHA = 160     # Behind the game over / win text
+
 # Story text
 STORY_TEXTS = [
     "You are an astronaut on a critical mission to retrieve magical stars from a mysterious moon.",
     "But beware! The ground beneath you is unstable. Where you walk the rocky surface crumbles away revealing deadly lava below.",
     "Large rocks will block your path, and darkness limits your vision. Be careful where you step - you are your own enemy! Good luck!"
-]
\ No newline at end of file
+]
+# Instructions screen, one paragraph each
+INSTRUCTION_TEXTS = [
+    "Move with the arrow keys or WASD and collect all three stars to win.",
+    "Every step leaves lava behind you. Touching your own lava ends the game, and rocks block your way.",
+    "F11 toggles fullscreen and F3 shows frame timings.",
+]
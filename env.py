@@ -0,0 +1,273 @@
+"""Moon Odyssey as an environment for agents.
+
+    env = MoonEnv("NORMAL")
+    observation = env.reset(seed=1)
+    observation, reward, done, info = env.step(INPUT_RIGHT | INPUT_DOWN)
+
+VectorEnv runs several of them in worker processes and steps them together.
+"""
+import multiprocessing
+import os
+import random
+import traceback
+from multiprocessing import shared_memory
+import numpy
+from constants import *
+
+MODES = ('NORMAL', 'BLIND', 'HARD')
+OBSERVATIONS = ('state', 'pixels')
+ACTIONS = 16  # Every INPUT_* bitmask
+
+# State observations: player x, y, invulnerable, lives and stars collected,
+# each potion's (present, x, y), then a wall and a lava occupancy grid of
+# ENV_GRID_CELL cells. Positions are scaled to 0..1 by the window size.
+GRID_COLUMNS = WINDOW_WIDTH // ENV_GRID_CELL
+GRID_ROWS = WINDOW_HEIGHT // ENV_GRID_CELL
+STATE_SIZE = 5 + 3 * 3 + 2 * GRID_ROWS * GRID_COLUMNS
+
+def init_headless():
+    """Start pygame with the dummy drivers unless a display is already up"""
+    import pygame
+    if pygame.display.get_init() and pygame.display.get_surface() is not None:
+        return
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    # Images are converted to the display format, so a (tiny) display is needed
+    pygame.display.set_mode((1, 1))
+
+def observation_buffer(observation, count=None):
+    """Shape and dtype of the buffer MoonEnv writes observations into"""
+    shape = (STATE_SIZE,) if observation == 'state' else (WINDOW_HEIGHT, WINDOW_WIDTH, 4)
+    dtype = numpy.float32 if observation == 'state' else numpy.uint8
+    return ((count,) + shape if count is not None else shape), dtype
+
+class MoonEnv:
+    """One game behind reset(seed) / step(action), one simulation tick per step.
+
+    Actions are INPUT_* bitmasks. A star is worth a reward of 1 and losing
+    a life -1; an episode ends when the game is won or lost, or after
+    max_ticks steps.
+
+    Pixel observations come from Game.screen, which is drawn straight into
+    a BGRA array: the observation is an RGB view of it, so no pixels are
+    copied, but it only holds until the next step. (A surfarray view would
+    keep the screen locked and stop the next frame's blits.)
+    """
+    def __init__(self, mode="NORMAL", observation="state", buffer=None, max_ticks=ENV_MAX_TICKS):
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}")
+        if observation not in OBSERVATIONS:
+            raise ValueError(f"unknown observation {observation!r}")
+        init_headless()
+        import pygame
+        from game import Game
+        from leaderboard import NullScores
+        from level_gen import LevelGenerator
+
+        self.observation = observation
+        self.max_ticks = max_ticks
+        shape, dtype = observation_buffer(observation)
+        # Observations are written into buffer, which may be shared memory (see VectorEnv)
+        self.buffer = numpy.zeros(shape, dtype) if buffer is None else buffer
+        if observation == 'pixels':
+            screen = pygame.image.frombuffer(self.buffer, (WINDOW_WIDTH, WINDOW_HEIGHT), "BGRA")
+            self.pixels = self.buffer[..., 2::-1]
+        else:
+            screen = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        # Levels always come from reset(), never from the background pool
+        self.game = Game(screen=screen, levels=LevelGenerator(0), scores=NullScores())
+        self.game.mode = mode
+        self.game.state = "GAME"
+        self.rng = random.Random()
+        self.walls_grid = numpy.zeros((GRID_ROWS, GRID_COLUMNS), dtype=numpy.float32)
+        self.lava_grid = numpy.zeros((GRID_ROWS, GRID_COLUMNS), dtype=numpy.float32)
+
+    def reset(self, seed=None):
+        """Start a new episode on the first level of LevelGenerator(seed) and return its observation.
+
+        Without a seed, the next one comes from the env's own RNG, which a
+        seeded reset also seeds.
+        """
+        from level_gen import LevelGenerator
+
+        if seed is None:
+            seed = self.rng.getrandbits(63)
+        else:
+            self.rng.seed(seed)
+        self.seed = seed
+        game = self.game
+        game.levels = LevelGenerator(seed)
+        game.walls = []  # Nothing to keep clear of, so the level only depends on the seed
+        game.reset_game()
+        self.potions = list(game.potions)
+        self.lives = game.lives
+        self.stars = 0
+
+        self.walls_grid[:] = 0
+        for wall in game.walls:
+            rect = wall.rect
+            self.walls_grid[rect.top // ENV_GRID_CELL:(rect.bottom - 1) // ENV_GRID_CELL + 1,
+                            rect.left // ENV_GRID_CELL:(rect.right - 1) // ENV_GRID_CELL + 1] = 1
+        self.lava_grid[:] = 0
+        self.lava_seen = 0
+        self.trail_resets = game.player.trail_resets
+        return self.observe()
+
+    def step(self, action):
+        """Advance one tick with action; returns (observation, reward, done, info)"""
+        game = self.game
+        game.update_game(int(action))
+        sim = game.sim
+        reward = float(sim.stars_collected - self.stars) - float(self.lives - sim.lives)
+        self.stars = sim.stars_collected
+        self.lives = sim.lives
+        truncated = sim.ticks >= self.max_ticks and not sim.finished
+        info = {
+            'seed': self.seed,
+            'ticks': sim.ticks,
+            'stars': sim.stars_collected,
+            'lives': sim.lives,
+            'won': sim.won and not sim.game_over,
+            'truncated': truncated,
+        }
+        return self.observe(), reward, sim.finished or truncated, info
+
+    def observe(self):
+        if self.observation == 'pixels':
+            self.game.draw_game()
+            return self.pixels
+        return self.state_vector()
+
+    def state_vector(self):
+        """Write the state observation into the buffer and return it"""
+        game = self.game
+        player = game.player
+        state = self.buffer
+        state[0] = player.rect.x / WINDOW_WIDTH
+        state[1] = player.rect.y / WINDOW_HEIGHT
+        state[2] = player.invulnerable
+        state[3] = game.lives
+        state[4] = game.stars_collected / 3
+        for i, potion in enumerate(self.potions):
+            state[5 + 3 * i:8 + 3 * i] = (potion in game.potions, potion.rect.x / WINDOW_WIDTH,
+                                          potion.rect.y / WINDOW_HEIGHT)
+
+        # Lava only counts once it leaves the grace window; pieces are added
+        # to the grid as they leave it, and the grid starts over when the
+        # trail is cleared
+        trail = player.lava_trail
+        if player.trail_resets != self.trail_resets:
+            self.trail_resets = player.trail_resets
+            self.lava_grid[:] = 0
+            self.lava_seen = 0
+        for i in range(self.lava_seen, len(trail) - LAVA_GRACE_PIECES):
+            x, y = trail[i]
+            self.lava_grid[(y + LAVA_SIZE // 2) // ENV_GRID_CELL, (x + LAVA_SIZE // 2) // ENV_GRID_CELL] = 1
+        self.lava_seen = max(self.lava_seen, len(trail) - LAVA_GRACE_PIECES)
+
+        cells = GRID_ROWS * GRID_COLUMNS
+        state[14:14 + cells] = self.walls_grid.ravel()
+        state[14 + cells:] = self.lava_grid.ravel()
+        return state
+
+def env_worker(conn, memory_name, count, index, mode, observation, max_ticks):
+    """Run the index-th env of a VectorEnv, writing its observations into shared memory"""
+    memory = shared_memory.SharedMemory(name=memory_name)
+    shape, dtype = observation_buffer(observation, count)
+    env = MoonEnv(mode, observation, numpy.ndarray(shape, dtype, memory.buf)[index], max_ticks)
+
+    while True:
+        command, *args = conn.recv()
+        if command == 'stop':
+            break
+        try:
+            if command == 'reset':
+                env.reset(args[0])
+                result = None
+            elif command == 'step':
+                _, reward, done, info = env.step(args[0])
+                # Finished episodes start over straight away, so every env always has a game
+                if done:
+                    env.reset()
+                result = (reward, done, info)
+            conn.send(('ok', result))
+        except Exception:
+            conn.send(('error', traceback.format_exc()))
+
+    del env  # Its screen is a view of the shared memory
+    memory.close()
+    conn.close()
+
+class VectorEnv:
+    """count MoonEnvs in worker processes, stepped together.
+
+    Every env has its own process, so steps run in parallel on as many
+    cores as there are envs. Workers write observations into one array in
+    shared memory (pixel observations are drawn straight into it); only
+    actions, rewards and infos go through the pipes. observations is that
+    array, as (count,) + the observation shape, and step() and reset()
+    return it rather than a copy.
+
+    An env whose episode ends is reset straight away, so the observation
+    returned with done is already the first of its next episode.
+    """
+    def __init__(self, count, mode="NORMAL", observation="state", max_ticks=ENV_MAX_TICKS):
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}")
+        if observation not in OBSERVATIONS:
+            raise ValueError(f"unknown observation {observation!r}")
+        self.count = count
+        shape, dtype = observation_buffer(observation, count)
+        self.memory = shared_memory.SharedMemory(create=True, size=int(numpy.prod(shape)) * numpy.dtype(dtype).itemsize)
+        self.buffer = numpy.ndarray(shape, dtype, self.memory.buf)
+        self.observations = self.buffer[..., 2::-1] if observation == 'pixels' else self.buffer
+
+        context = multiprocessing.get_context("spawn")
+        self.workers = []
+        self.connections = []
+        for index in range(count):
+            parent_conn, child_conn = context.Pipe()
+            worker = context.Process(target=env_worker, daemon=True,
+                                     args=(child_conn, self.memory.name, count, index, mode, observation, max_ticks))
+            worker.start()
+            self.workers.append(worker)
+            self.connections.append(parent_conn)
+
+    def request_all(self, messages):
+        """Send one message to every worker, then collect all the answers"""
+        for conn, message in zip(self.connections, messages):
+            conn.send(message)
+        results = []
+        for conn in self.connections:
+            status, result = conn.recv()
+            if status == 'error':
+                raise RuntimeError(result)
+            results.append(result)
+        return results
+
+    def reset(self, seed=None):
+        """Reset every env (env i on seed + i) and return the observations"""
+        self.request_all(('reset', None if seed is None else seed + i) for i in range(self.count))
+        return self.observations
+
+    def step(self, actions):
+        """Step env i with actions[i]; returns (observations, rewards, dones, infos)"""
+        results = self.request_all(('step', int(action)) for action in actions)
+        rewards = numpy.array([reward for reward, _, _ in results], dtype=numpy.float32)
+        dones = numpy.array([done for _, done, _ in results], dtype=bool)
+        return self.observations, rewards, dones, [info for _, _, info in results]
+
+    def close(self):
+        for conn in self.connections:
+            conn.send(('stop',))
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.workers.clear()
+        self.connections.clear()
+        self.buffer = self.observations = None
+        try:
+            self.memory.close()
+        except BufferError:
+            pass  # The caller still holds a view of the observations
+        self.memory.unlink()
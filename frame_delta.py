@@ -0,0 +1,201 @@
+import struct
+import threading
+from io import BytesIO
+import numpy
+import pygame
+from constants import *
+
+# Frames are (height, width, 4) uint8 arrays of B, G, R and an unused byte,
+# the layout of the game's 32-bit surfaces, so capturing one is a plain copy.
+#
+# Packet: header, then one u16 index per changed tile, then an image
+# (DELTA_FORMAT) holding those tiles side by side. Each tile sits in a slot
+# padded to a multiple of 16 pixels with copies of its edge, so JPEG blocks
+# never mix pixels of two tiles. A keyframe has no indices; its image is the
+# whole frame.
+HEADER = struct.Struct("<4sBIHHHH")  # magic, flags, sequence, width, height, tile size, tile count
+MAGIC = b"MOTD"
+KEYFRAME = 1
+
+def frame_pixels(surface):
+    """Copy a surface's pixels into a (height, width, 4) BGRX frame"""
+    width, height = surface.get_size()
+    if surface.get_bitsize() == 32 and surface.get_shifts()[:3] == (16, 8, 0) and surface.get_pitch() == width * 4:
+        data = surface.get_buffer().raw
+    else:
+        data = pygame.image.tobytes(surface, "BGRA")
+    return numpy.frombuffer(data, dtype=numpy.uint8).reshape(height, width, 4)
+
+def split_tiles(frame, tile_size):
+    """View a frame as (rows, columns, tile_size, tile_size, channels) tiles without copying"""
+    height, width, channels = frame.shape
+    rows, columns = height // tile_size, width // tile_size
+    return frame.reshape(rows, tile_size, columns, tile_size, channels).swapaxes(1, 2)
+
+def changed_tiles(frame, previous, tile_size):
+    """(rows, columns) mask of the tiles that differ between two frames"""
+    height, width, channels = frame.shape
+    rows, columns = height // tile_size, width // tile_size
+    span = tile_size * channels
+    frame, previous = frame.reshape(height, width * channels), previous.reshape(height, width * channels)
+    if span % 8 == 0 and frame.flags.c_contiguous and previous.flags.c_contiguous:
+        # Compare 8 bytes at a time
+        frame, previous = frame.view(numpy.uint64), previous.view(numpy.uint64)
+        span //= 8
+    differs = frame.reshape(rows, tile_size, columns, span) != previous.reshape(rows, tile_size, columns, span)
+    return differs.any(axis=(1, 3))
+
+def slot_size(tile_size):
+    return -(-tile_size // 16) * 16
+
+def encode_image(pixels, image_format):
+    """Encode a (height, width, 4) BGRX array, which is overwritten with an opaque alpha"""
+    height, width, _ = pixels.shape
+    pixels[..., 3] = 255
+    data = BytesIO()
+    pygame.image.save(pygame.image.frombuffer(pixels, (width, height), "BGRA"), data, "tiles." + image_format)
+    return data.getvalue()
+
+def decode_image(data):
+    """Decode an encoded image into a (height, width, 3) RGB array"""
+    image = pygame.image.load(BytesIO(data))
+    width, height = image.get_size()
+    return numpy.frombuffer(pygame.image.tobytes(image, "RGB"), dtype=numpy.uint8).reshape(height, width, 3)
+
+class TileDeltaEncoder:
+    """Turns successive frames into packets holding only the tiles that changed.
+
+    Every keyframe_interval-th packet is a keyframe holding the whole frame,
+    so a new spectator can start from it. Tiles are compared with the last
+    frame captured, not the last one decoded, so a lossy image_format never
+    lets errors build up: a tile is resent whole whenever it changes.
+    """
+    def __init__(self, tile_size=DELTA_TILE_SIZE, keyframe_interval=DELTA_KEYFRAME_INTERVAL,
+                 image_format=DELTA_FORMAT):
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+        self.image_format = image_format
+        self.previous = None
+        self.sequence = 0
+
+    def encode(self, frame, keyframe=False):
+        """Encode a frame from frame_pixels and return (packet bytes, is keyframe)"""
+        height, width, _ = frame.shape
+        tile_size = self.tile_size
+        if height % tile_size or width % tile_size:
+            raise ValueError(f"frame size {width}x{height} is not a multiple of {tile_size}")
+
+        keyframe = (keyframe or self.previous is None or self.previous.shape != frame.shape
+                    or self.sequence % self.keyframe_interval == 0)
+        if keyframe:
+            indices = numpy.zeros(0, dtype="<u2")
+            payload = encode_image(frame.copy(), self.image_format)
+        else:
+            changed = changed_tiles(frame, self.previous, tile_size)
+            indices = numpy.flatnonzero(changed).astype("<u2")
+            payload = b""
+            if len(indices):
+                # Changed tiles in a row of padded slots
+                pad = slot_size(tile_size) - tile_size
+                tiles = numpy.pad(split_tiles(frame, tile_size)[changed], ((0, 0), (0, pad), (0, pad), (0, 0)), mode='edge')
+                payload = encode_image(numpy.concatenate(tiles, axis=1), self.image_format)
+        self.sequence += 1
+        self.previous = frame
+        header = HEADER.pack(MAGIC, KEYFRAME if keyframe else 0, self.sequence,
+                             width, height, tile_size, len(indices))
+        return header + indices.tobytes() + payload, keyframe
+
+class TileDeltaDecoder:
+    """Rebuilds frames, as (height, width, 3) RGB arrays, from packets made by TileDeltaEncoder"""
+    def __init__(self):
+        self.frame = None
+        self.sequence = 0
+
+    def apply(self, packet):
+        """Apply one packet and return the resulting (height, width, 3) frame"""
+        magic, flags, sequence, width, height, tile_size, count = HEADER.unpack_from(packet)
+        if magic != MAGIC:
+            raise ValueError("not a tile delta packet")
+        offset = HEADER.size
+        if flags & KEYFRAME:
+            self.frame = decode_image(packet[offset:]).copy()
+            if self.frame.shape != (height, width, 3):
+                raise ValueError("keyframe image doesn't match the packet size")
+        elif self.frame is None or sequence != self.sequence + 1:
+            raise ValueError(f"packet {sequence} doesn't follow frame {self.sequence}")
+        elif count:
+            indices = numpy.frombuffer(packet, dtype="<u2", count=count, offset=offset)
+            slot = slot_size(tile_size)
+            strip = decode_image(packet[offset + count * 2:]).reshape(slot, count, slot, 3).swapaxes(0, 1)
+            tiles = split_tiles(self.frame, tile_size)
+            columns = tiles.shape[1]
+            tiles[indices // columns, indices % columns] = strip[:, :tile_size, :tile_size]
+        self.sequence = sequence
+        return self.frame
+
+    def to_surface(self):
+        height, width, _ = self.frame.shape
+        return pygame.image.frombuffer(self.frame.tobytes(), (width, height), "RGB")
+
+class DeltaBroadcast:
+    """Encodes one session's frames once and shares the packets with every spectator.
+
+    Packets since the latest keyframe are kept, so a spectator that joins or
+    falls behind restarts from that keyframe.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        self.encoder = TileDeltaEncoder()
+        self.lock = threading.Lock()
+        self.busy = False
+        self.packets = []  # (sequence, bytes) from the latest keyframe on
+        self.bytes_sent = 0
+        self.frames_dropped = 0
+
+    def submit(self, surface):
+        """Encode the surface on the pool unless the previous frame is still encoding"""
+        with self.lock:
+            if self.busy:
+                self.frames_dropped += 1
+                return False
+            self.busy = True
+        self.pool.submit(self.encode, frame_pixels(surface))
+        return True
+
+    def encode(self, frame):
+        try:
+            packet, keyframe = self.encoder.encode(frame)
+            with self.lock:
+                if keyframe:
+                    self.packets = []
+                self.packets.append((self.encoder.sequence, packet))
+        finally:
+            with self.lock:
+                self.busy = False
+
+    def packets_after(self, after):
+        """Return (latest sequence, packets a spectator at sequence after still needs)"""
+        with self.lock:
+            if not self.packets:
+                return after, []
+            first = self.packets[0][0]
+            latest = self.packets[-1][0]
+            if after < first - 1 or after > latest:
+                after = first - 1  # Restart from the keyframe
+            packets = [packet for sequence, packet in self.packets[after - first + 1:]]
+            self.bytes_sent += sum(len(packet) for packet in packets)
+            return latest, packets
+
+def pack_packets(packets):
+    """Join packets into one body, each prefixed with its u32 length"""
+    return b"".join(struct.pack("<I", len(packet)) + packet for packet in packets)
+
+def unpack_packets(body):
+    """Split a body made by pack_packets back into packets"""
+    packets = []
+    offset = 0
+    while offset < len(body):
+        (length,) = struct.unpack_from("<I", body, offset)
+        packets.append(body[offset + 4:offset + 4 + length])
+        offset += 4 + length
+    return packets
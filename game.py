@@ -0,0 +1,663 @@
+import time
+import pygame
+import assets
+from lighting import Lighting, create_overlay
+from text_cache import get_text_cache
+from renderer import LayeredRenderer
+from player import Player, read_inputs
+from simulation import Simulation
+from level_gen import get_level_pool
+from leaderboard import get_store
+from profiling import PHASES, profiler
+from game_objects import Potion, Wall, create_wall_image
+from ui import Screen, button, label
+from constants import *
+
+# Keys that start each mode on the mode select screen
+MODE_KEYS = {pygame.K_1: "NORMAL", pygame.K_2: "BLIND", pygame.K_3: "WORLD", pygame.K_4: "HARD"}
+# Events that never change what a static screen shows
+PASSIVE_EVENTS = (pygame.MOUSEMOTION,)
+
+def wait_events(timeout_ms):
+    """Block until events arrive or timeout_ms pass, and return the events.
+
+    SDL's dummy video driver can't block, and its event.wait polls every
+    millisecond, so there the wait sleeps in coarser steps instead.
+    """
+    if pygame.display.get_driver() == "dummy":
+        deadline = time.perf_counter() + timeout_ms / 1000
+        events = pygame.event.get()
+        while not events and time.perf_counter() < deadline:
+            time.sleep(0.02)
+            events = pygame.event.get()
+        return events
+    event = pygame.event.wait(timeout_ms)
+    return ([] if event.type == pygame.NOEVENT else [event]) + pygame.event.get()
+
+class Game:
+    def __init__(self, screen=None, levels=None, scores=None, player_name="player"):
+        pygame.init()
+        self.fullscreen = False
+        # Games given their own surface draw offscreen, so one process can
+        # host many of them (see sessions.py); the rest use the window
+        self.offscreen = screen is not None
+        if self.offscreen:
+            self.screen = screen
+        else:
+            self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+            pygame.display.set_caption("Moon Explorer")
+        self.FULLSCREEN_WIDTH = pygame.display.Info().current_w
+        self.FULLSCREEN_HEIGHT = pygame.display.Info().current_h
+        self.clock = pygame.time.Clock()
+        # Where new levels come from: a seeded LevelGenerator, or the
+        # process-wide pool of levels generated in the background
+        self.levels = levels if levels is not None else get_level_pool()
+        self.state = "STORY"
+        self.mode = None
+
+        # Dirty-rect presentation: only regions reported through mark_dirty are
+        # sent to the display, unless a full redraw was requested
+        self.dirty_rect_mode = DIRTY_RECT_MODE
+        self.dirty_rects = []
+        self.previous_dirty_rects = []
+        self.full_redraw = True
+        self.presented_state = None
+        self.presented_pixels = 0
+        self.presented_pixels_total = 0
+        self.frames_presented = 0
+
+        # Finish times are saved by the (process-wide) score store
+        self.scores = scores if scores is not None else get_store()
+        self.player_name = player_name
+        self.story_page = 0
+        self.fade_alpha = 255
+        self.fade_speed = 2
+        
+        # Load images and font
+        self.background = assets.load_image("assets/background.png", (WINDOW_WIDTH, WINDOW_HEIGHT), alpha=False)
+        self.heart_img = assets.load_image("assets/heart.png", (30, 30))
+        self.star_img = assets.load_image("assets/potion2.png", (40, 40))
+        
+        # Load pixel font with smaller sizes
+        try:
+            self.pixel_font = assets.load_font("assets/pixel_font.ttf", 54)
+            self.pixel_font_small = assets.load_font("assets/pixel_font.ttf", 24)
+            self.pixel_font_tiny = assets.load_font("assets/pixel_font.ttf", 20)
+        except:
+            print("Pixel font not found! Please add pixel_font.ttf to assets folder")
+            self.pixel_font = assets.load_font(None, 54)
+            self.pixel_font_small = assets.load_font(None, 24)
+            self.pixel_font_tiny = assets.load_font(None, 20)
+        self.text_cache = get_text_cache()
+        
+        # Load additional images
+        self.moon_img = assets.load_image("assets/background.png", (200, 200), alpha=False)
+
+        # Overlays are built once and reused every frame
+        self.lighting = Lighting()
+        self.story_text_bg = create_overlay(180, (700, 200))
+        self.indicator_bg = create_overlay(180, (300, 40))
+        self.profiler_bg = create_overlay(180, (250, 20 * (len(PHASES) + 2)))
+        self.profiler_font = assets.load_font(None, 20)
+        self.show_profiler = False  # F3 toggles the frame timing overlay
+        self.screens = {}  # Widget trees of the menus and overlays, by name
+        # Static screens are only redrawn after input (see run)
+        self.adaptive_pacing = ADAPTIVE_PACING
+        self.shown_ui = None
+        self.frame_counts = {}  # State -> frames drawn and idle wake-ups
+        self.renderer = LayeredRenderer(self.background)
+        self.world_renderer = None  # Created for the first large-world game
+
+        self.reset_game()
+        self.heart_flash_timer = 0
+        self.heart_visible = True
+
+    def reset_game(self):
+        """Reset the game state"""
+        if self.mode == "WORLD":
+            self.reset_world()
+            return
+
+        # New walls are placed away from the previous level's walls
+        old_walls = [wall.rect for wall in self.walls] if hasattr(self, 'walls') else []
+        walls, spawn, potions = self.levels.next_level(old_walls, hard=self.mode == "HARD")
+
+        self.walls = [Wall(x, y) for x, y in walls]
+        self.player = Player(*spawn)
+        self.potions = [Potion(x, y) for x, y in potions]
+
+        # The rules run in the simulation; Game only feeds it keys and draws it.
+        # Offscreen games are stepped at a fixed rate, so their time is the tick count.
+        clock = None if self.offscreen else pygame.time.get_ticks
+        self.sim = Simulation(self.player, self.walls, self.potions, clock=clock)
+
+        # Walls never move, so render them into the static layer once
+        self.renderer.build_level(self.walls)
+        self.full_redraw = True
+
+    def reset_world(self):
+        """Start a large-world game in a new World"""
+        from renderer import ChunkRenderer
+        from world import World, WorldPlayer, WorldSimulation
+
+        self.world = World()
+        self.walls = []
+        self.player = WorldPlayer(self.world, *self.world.spawn)
+        self.potions = [Potion(x, y) for x, y in self.world.potions]
+        clock = None if self.offscreen else pygame.time.get_ticks
+        self.sim = WorldSimulation(self.world, self.player, self.potions, clock=clock)
+        if self.world_renderer is None:
+            self.world_renderer = ChunkRenderer(self.background, assets.get_surface("wall", create_wall_image),
+                                                self.player.lava_image)
+        self.full_redraw = True
+
+    def draw_world_scene(self):
+        """Draw the view of the World around the player and return its offset from world coordinates"""
+        camera = self.world.camera(self.player.rect.center, self.screen.get_size())
+        self.world_renderer.draw(self.screen, self.world, camera, self.player)
+        offset = (-camera[0], -camera[1])
+        view = self.screen.get_rect().move(camera)
+        for potion in self.potions:
+            if view.colliderect(potion.rect):
+                potion.draw(self.screen, offset)
+        self.player.draw_player(self.screen, offset)
+        return offset
+
+    # Game state lives in the simulation
+    @property
+    def lives(self):
+        return self.sim.lives
+
+    @property
+    def stars_collected(self):
+        return self.sim.stars_collected
+
+    @property
+    def game_over(self):
+        return self.sim.game_over
+
+    @game_over.setter
+    def game_over(self, value):
+        self.sim.game_over = value
+
+    @property
+    def won(self):
+        return self.sim.won
+
+    @won.setter
+    def won(self, value):
+        self.sim.won = value
+
+    def draw_lives(self):
+        current_time = pygame.time.get_ticks()
+        if self.heart_flash_timer > current_time:
+            if (current_time // 100) % 2:  # Flash every 100ms
+                return
+        
+        # Draw hearts
+        for i in range(self.lives):
+            self.screen.blit(self.heart_img, (10 + i * 35, 10))
+        
+        # Draw life counter
+        text = self.text_cache.render(self.pixel_font_tiny, f'Lives: {self.lives}/1', True, (255, 255, 255))
+        self.screen.blit(text, (50, 15))
+
+    def draw_stars_collected(self):
+        # Draw counter
+        text = self.text_cache.render(self.pixel_font_tiny, f'Stars: {self.stars_collected}/3', True, (255, 255, 255))
+        text_x = WINDOW_WIDTH - text.get_width() - 10
+        self.screen.blit(text, (text_x, 10))
+        
+        # Draw collected stars with more spacing
+        for i in range(self.stars_collected):
+            star_x = text_x - (i + 1) * 50 - 20
+            self.screen.blit(self.star_img, (star_x, 5))
+
+    def ui(self, name, key, build):
+        """Widget tree of a screen, laid out by build(key) and kept until key changes"""
+        screen = self.screens.get(name)
+        if screen is None or screen.key != key:
+            screen = self.screens[name] = build(key)
+        return screen
+
+    def title_widgets(self):
+        title = self.text_cache.render(self.pixel_font, 'Moon Odyssey', True, (255, 255, 255))
+        credit = self.text_cache.render(self.pixel_font_tiny, 'Created by Estella Gu', True, (255, 255, 255))
+        return [label(title, midtop=(WINDOW_WIDTH//2, 100)), label(credit, midtop=(WINDOW_WIDTH//2, 160))]
+
+    def menu_buttons(self, entries, top, spacing, height):
+        """Grey buttons of (text, action) stacked down the middle of the screen"""
+        width = 400
+        return [button((WINDOW_WIDTH//2 - width//2, top + i*spacing, width, height),
+                       self.text_cache.render(self.pixel_font_small, text, True, (255, 255, 255)), (70, 70, 70), action)
+                for i, (text, action) in enumerate(entries)]
+
+    def build_menu(self, key):
+        return Screen(key, self.title_widgets() + self.menu_buttons(
+            [('Play (press SPACE)', 'play'), ('Instructions (press I)', 'instructions')], 250, 100, 80))
+
+    def draw_menu(self):
+        self.ui("menu", None, self.build_menu).draw(self.screen)
+
+    def build_mode_select(self, best_times):
+        entries = [('Limited Light (press 1)', 'NORMAL'), ('No Light (press 2)', 'BLIND'),
+                   ('Open World (press 3)', 'WORLD'), ('Hard (press 4)', 'HARD')]
+        widgets = self.title_widgets() + self.menu_buttons(entries, 200, 80, 66)
+
+        # High scores
+        start_y = 200 + len(entries) * 80
+        for mode, best_time in zip(SCORED_MODES, best_times):
+            score_text = f"Best {mode}: "
+            if best_time == float('inf'):
+                score_text += "No record"
+            else:
+                score_text += f"{best_time / 1000:.1f}s"
+            score = self.text_cache.render(self.pixel_font_tiny, score_text, True, (255, 255, 0))
+            widgets.append(label(score, midtop=(WINDOW_WIDTH//2, start_y)))
+            start_y += 25
+        return Screen(best_times, widgets)
+
+    def mode_select_ui(self):
+        # Rebuilt only when a best time changes
+        best_times = tuple(self.scores.best_time(mode) for mode in SCORED_MODES)
+        return self.ui("mode", best_times, self.build_mode_select)
+
+    def draw_mode_select(self):
+        self.mode_select_ui().draw(self.screen)
+
+    def build_instructions(self, key):
+        heading = self.text_cache.render(self.pixel_font, 'How to Play', True, (255, 255, 255))
+        widgets = [label(heading, midtop=(WINDOW_WIDTH//2, 80))]
+        y = 180
+        for paragraph in INSTRUCTION_TEXTS:
+            for line in self.text_cache.wrap(self.pixel_font_tiny, paragraph, 640):
+                text = self.text_cache.render(self.pixel_font_tiny, line, True, (255, 255, 255))
+                widgets.append(label(text, midtop=(WINDOW_WIDTH//2, y)))
+                y += 26
+            y += 18
+        widgets += self.menu_buttons([('Back (press SPACE)', 'menu')], WINDOW_HEIGHT - 110, 0, 66)
+        return Screen(key, widgets)
+
+    def draw_instructions(self):
+        self.ui("instructions", None, self.build_instructions).draw(self.screen)
+
+    def current_ui(self):
+        """Widget tree taking clicks in the current state, or None"""
+        if self.state == "MENU":
+            return self.ui("menu", None, self.build_menu)
+        if self.state == "MODE":
+            return self.mode_select_ui()
+        if self.state == "INSTRUCTIONS":
+            return self.ui("instructions", None, self.build_instructions)
+        if self.state == "GAME" and (self.game_over or self.won):
+            return self.ui("finished", self.won and not self.game_over, self.build_finished)
+        return None
+
+    def start_game(self, mode):
+        self.mode = mode
+        self.state = "GAME"
+        self.reset_game()
+
+    def perform(self, action):
+        """Carry out what a clicked widget stands for"""
+        if action == "play":
+            self.state = "MODE"
+        elif action == "instructions":
+            self.state = "INSTRUCTIONS"
+        elif action == "menu":
+            self.state = "MENU"
+        elif action == "restart":
+            self.state = "MODE"  # Go back to mode selection
+            self.story_page = 0
+        elif action in ("NORMAL", "BLIND", "WORLD", "HARD"):
+            self.start_game(action)
+
+    def draw_game_indicators(self):
+        """Draw game HUD (lives, time, stars)"""
+        # Background for indicators, positioned at top center
+        bg_rect = self.indicator_bg.get_rect(midtop=(WINDOW_WIDTH//2, 5))
+        touched = [self.screen.blit(self.indicator_bg, bg_rect)]
+        
+        # Draw lives
+        touched.append(self.screen.blit(self.heart_img, (bg_rect.left + 20, 10)))
+        lives_text = self.text_cache.render(self.pixel_font_tiny, f'{self.lives}/1', True, (255, 255, 255))
+        touched.append(self.screen.blit(lives_text, (bg_rect.left + 55, 15)))
+        
+        # Draw timer (only re-rendered when the displayed tenth changes)
+        elapsed_time = self.sim.elapsed_ms / 1000
+        timer_text = self.text_cache.render(self.pixel_font_tiny, f'{elapsed_time:.1f}s', True, (255, 255, 255))
+        touched.append(self.screen.blit(timer_text, (bg_rect.centerx - timer_text.get_width()//2, 15)))
+        
+        # Draw stars collected
+        touched.append(self.screen.blit(self.star_img, (bg_rect.right - 60, 5)))
+        stars_text = self.text_cache.render(self.pixel_font_tiny, f'{self.stars_collected}/3', True, (255, 255, 255))
+        touched.append(self.screen.blit(stars_text, (bg_rect.right - 30, 15)))
+        self.mark_dirty(bg_rect.unionall(touched))
+
+    def animating(self):
+        """Whether the current screen changes without any input"""
+        if self.show_profiler:
+            return True
+        if self.state == "GAME":
+            # Gameplay, or the hearts still flashing
+            return not (self.game_over or self.won) or pygame.time.get_ticks() < self.heart_flash_timer
+        if self.state == "STORY":
+            return self.fade_alpha > 0
+        return False
+
+    def count_frame(self, kind):
+        """Count a 'drawn' or an 'idle' (nothing to draw) frame of the current state"""
+        counts = self.frame_counts.setdefault(self.state, {'drawn': 0, 'idle': 0})
+        counts[kind] += 1
+
+    def run(self):
+        running = True
+        redraw = True
+        while running:
+            profiler.begin_frame()
+            if self.adaptive_pacing and not redraw and not self.animating():
+                # Nothing moves: sleep until an event comes instead of ticking at 60 FPS
+                events = wait_events(IDLE_WAIT_MS)
+            else:
+                events = pygame.event.get()
+            
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_F11:
+                        self.toggle_fullscreen()
+                    elif event.key == pygame.K_F3:
+                        # Frame phases are only timed while the overlay is up
+                        self.show_profiler = not self.show_profiler
+                        profiler.enabled = self.show_profiler
+                    elif event.key == pygame.K_ESCAPE and self.fullscreen:
+                        self.toggle_fullscreen()
+                    elif event.key == pygame.K_SPACE:
+                        if self.state == "STORY":
+                            self.next_story_page()
+                        elif self.state == "MENU":
+                            self.state = "MODE"
+                        elif self.state == "INSTRUCTIONS":
+                            self.state = "MENU"
+                    elif self.state == "MENU" and event.key == pygame.K_i:
+                        self.state = "INSTRUCTIONS"
+                    elif self.state == "MODE" and event.key in MODE_KEYS:
+                        self.start_game(MODE_KEYS[event.key])
+                
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if self.state == "STORY":
+                        self.next_story_page()
+                    else:
+                        # Hit-tested against the rects laid out when the screen was built
+                        ui = self.current_ui()
+                        if ui is not None:
+                            self.perform(ui.hit(event.pos))
+
+            profiler.mark('input')
+            animating = self.animating()
+            if (self.adaptive_pacing and not redraw and not animating and self.current_ui() is self.shown_ui
+                    and all(event.type in PASSIVE_EVENTS for event in events)):
+                # The frame on screen is still right, so neither draw nor flip it
+                self.count_frame('idle')
+                continue
+
+            # Story and game screens cover the whole frame themselves
+            if self.state not in ("STORY", "GAME"):
+                self.screen.blit(self.background, (0, 0))
+            if self.state == "STORY":
+                self.draw_story()
+            elif self.state == "MENU":
+                self.draw_menu()
+            elif self.state == "MODE":
+                self.draw_mode_select()
+            elif self.state == "INSTRUCTIONS":
+                self.draw_instructions()
+            elif self.state == "GAME":
+                self.run_game()
+            if self.show_profiler:
+                self.draw_profiler()
+            profiler.mark('draw')
+
+            self.present()
+            profiler.mark('present')
+            self.count_frame('drawn')
+            self.shown_ui = self.current_ui()
+            # A frame drawn mid-animation is followed by one more, so the last one shows it finished
+            redraw = animating
+            self.clock.tick(60)
+            profiler.mark('wait')
+            profiler.end_frame()
+
+        pygame.quit()
+
+    def draw_profiler(self):
+        """Draw p50/p95/p99 of each frame phase in the bottom left corner"""
+        summary = profiler.summary()
+        rect = self.profiler_bg.get_rect(bottomleft=(5, WINDOW_HEIGHT - 5))
+        self.screen.blit(self.profiler_bg, rect)
+        rows = [('ms', ('p50', 'p95', 'p99'))]
+        rows += [(name, [f"{values[q]:.2f}" for q in ('p50', 'p95', 'p99')])
+                 for name, values in [('frame', summary['frame'])] + list(summary['phases'].items())]
+        for i, (name, cells) in enumerate(rows):
+            y = rect.top + 4 + i * 20
+            # Numbers change every frame, so these don't go through the text cache
+            self.screen.blit(self.profiler_font.render(name, True, (255, 255, 255)), (rect.left + 8, y))
+            for j, cell in enumerate(cells):
+                text = self.profiler_font.render(cell, True, (255, 255, 255))
+                self.screen.blit(text, (rect.left + 130 + j * 55 - text.get_width(), y))
+        self.full_redraw = True
+
+    def toggle_fullscreen(self):
+        self.fullscreen = not self.fullscreen
+        flags = pygame.FULLSCREEN if self.fullscreen else 0
+        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), flags)
+        self.full_redraw = True
+
+    def mark_dirty(self, rect):
+        """Report a screen region that changed this frame"""
+        # Only present() consumes these, and offscreen games never call it
+        if self.dirty_rect_mode and not self.offscreen:
+            self.dirty_rects.append(rect)
+
+    def present(self):
+        """Show the frame, sending only the dirty regions when possible"""
+        # Only live gameplay reports its dirty regions; everything else
+        # (story fades, menus, overlays, state changes) is presented in full
+        playing = self.state == "GAME" and not self.game_over and not self.won
+        if self.state != self.presented_state or not playing:
+            self.full_redraw = True
+        self.presented_state = self.state
+
+        if not self.dirty_rect_mode or self.full_redraw:
+            pygame.display.flip()
+            self.presented_pixels = WINDOW_WIDTH * WINDOW_HEIGHT
+        else:
+            # Last frame's regions are included so things that moved away get erased
+            screen_rect = self.screen.get_rect()
+            rects = [rect.clip(screen_rect) for rect in self.previous_dirty_rects + self.dirty_rects]
+            pygame.display.update(rects)
+            self.presented_pixels = sum(rect.width * rect.height for rect in rects)
+
+        self.presented_pixels_total += self.presented_pixels
+        self.frames_presented += 1
+        self.previous_dirty_rects = self.dirty_rects
+        self.dirty_rects = []
+        self.full_redraw = False
+
+    def run_game(self):
+        self.update_game()
+        self.draw_game()
+
+    def update_game(self, inputs=None):
+        """Advance the game one tick, reading the keyboard unless inputs are given"""
+        if not self.game_over and not self.won:
+            lives = self.lives
+            self.sim.step(read_inputs() if inputs is None else inputs)
+
+            if self.lives < lives:
+                self.heart_flash_timer = pygame.time.get_ticks() + 1000
+                self.full_redraw = True
+
+            # Save the finish time once, on the tick the game is won
+            if self.won and not self.game_over:
+                self.scores.submit(self.mode, self.sim.elapsed_ms, self.player_name)
+
+    def draw_game(self):
+        # The game over / win screens cover the whole frame
+        if self.game_over:
+            self.draw_game_over()
+            return
+        elif self.won:
+            self.draw_win_screen()
+            return
+
+        if self.mode == "WORLD":
+            # The view scrolls, so every frame changes everywhere
+            offset = self.draw_world_scene()
+            self.lighting.apply_light(self.screen, self.player.rect.move(offset).center)
+            self.full_redraw = True
+        elif self.mode in ("NORMAL", "HARD"):
+            # Draw all game elements first
+            self.renderer.draw_world(self.screen, self.player)
+            for potion in self.potions:
+                potion.draw(self.screen)
+            self.player.draw_player(self.screen)
+            
+            # Apply the darkness with light circle last
+            self.lighting.apply_light(self.screen, self.player.rect.center)
+            self.mark_dirty(self.lighting.light_rect(self.player.rect.center))
+        else:
+            # Blind mode - complete darkness except player and stars
+            self.screen.blit(self.background, (0, 0))
+            # Draw player and stars on top of darkness
+            self.player.draw_player(self.screen)  # Draw only player, not lava
+            for potion in self.potions:
+                potion.draw(self.screen)
+                
+            # Make everything else black
+            self.lighting.apply_blind(self.screen)
+            
+            # Redraw player and stars to ensure they're visible
+            self.player.draw_player(self.screen)
+            for potion in self.potions:
+                potion.draw(self.screen)
+            self.mark_dirty(self.player.rect.copy())
+
+        # Collected potions disappear, so their spots are always reported
+        for potion in self.potions:
+            self.mark_dirty(potion.rect)
+
+        self.draw_game_indicators()
+
+    def draw_scene(self):
+        """Draw the level, lava, player and potions without any darkness"""
+        if self.mode == "WORLD":
+            self.draw_world_scene()
+            return
+        self.renderer.draw_world(self.screen, self.player)
+        self.player.draw_player(self.screen)
+        for potion in self.potions:
+            potion.draw(self.screen)
+
+    def build_finished(self, won):
+        """Texts and restart button shown over the dimmed level once the game is over"""
+        color = TEXT_COLOR_WIN if won else TEXT_COLOR_LOSE
+        text1 = self.text_cache.render(self.pixel_font, "You Win!" if won else 'Game Over!', True, color)
+        text2 = self.text_cache.render(self.pixel_font_small, "Congrats, you've saved humanity!" if won
+                                       else "You are your own enemy!", True, color)
+        restart = self.text_cache.render(self.pixel_font_small, 'Restart', True, (255, 255, 255))
+        return Screen(won, [
+            label(text1, midtop=(WINDOW_WIDTH//2, WINDOW_HEIGHT//3)),
+            label(text2, midtop=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2)),
+            button((WINDOW_WIDTH//2 - 80, WINDOW_HEIGHT * 3//4, 160, 50), restart, BUTTON_COLOR, "restart",
+                   border=(120, 120, 120), shade=(100, 100, 100)),
+        ])
+
+    def draw_game_over(self):
+        # Show full screen without darkness
+        self.draw_scene()
+        
+        # Semi-transparent overlay
+        self.lighting.apply_dim(self.screen)
+        self.ui("finished", False, self.build_finished).draw(self.screen)
+
+    def draw_win_screen(self):
+        # Show full screen without darkness
+        self.draw_scene()
+        
+        # Semi-transparent overlay
+        self.lighting.apply_dim(self.screen)
+        self.ui("finished", True, self.build_finished).draw(self.screen)
+
+    def next_story_page(self):
+        self.story_page += 1
+        self.fade_alpha = 255
+        if self.story_page >= len(STORY_TEXTS):
+            self.state = "MENU"
+
+    def build_story(self, page):
+        """Pictures and text of a story page, with the images scaled once"""
+        widgets = []
+        if page == 0:
+            # First page - show large astronaut with stars
+            large_astronaut = pygame.transform.scale(self.player.image, (PLAYER_SIZE * 2, PLAYER_SIZE * 2))
+            astronaut_pos = (WINDOW_WIDTH//2 - PLAYER_SIZE, WINDOW_HEIGHT//3 - PLAYER_SIZE)
+            widgets.append(label(large_astronaut, topleft=astronaut_pos))
+            
+            # Stars on either side
+            star_size = 80
+            scaled_star = pygame.transform.scale(self.star_img, (star_size, star_size))
+            widgets.append(label(scaled_star, topleft=(astronaut_pos[0] - star_size - 20, astronaut_pos[1])))
+            widgets.append(label(scaled_star, topleft=(astronaut_pos[0] + PLAYER_SIZE * 2 + 20, astronaut_pos[1])))
+            
+        elif page == 1:
+            # Second page - show larger lava
+            large_lava = pygame.transform.scale(self.player.lava_image, (LAVA_SIZE * 2, LAVA_SIZE * 2))
+            for i in range(5):
+                widgets.append(label(large_lava, topleft=(WINDOW_WIDTH//4 + i*100, WINDOW_HEIGHT//3)))
+            
+        else:  # Final page
+            # Moon background
+            moon_size = 300
+            scaled_moon = pygame.transform.scale(self.moon_img, (moon_size, moon_size))
+            widgets.append(label(scaled_moon, topleft=(WINDOW_WIDTH//2 - moon_size//2, WINDOW_HEIGHT//4)))
+            
+            # Astronaut
+            widgets.append(label(self.player.image, topleft=(WINDOW_WIDTH//2 - PLAYER_SIZE, WINDOW_HEIGHT//3)))
+            
+            # Stars
+            for i in range(3):
+                widgets.append(label(self.star_img, topleft=(WINDOW_WIDTH//4 + i*200, WINDOW_HEIGHT//3 - 50)))
+            
+            # Lava trail
+            for i in range(3):
+                widgets.append(label(self.player.lava_image, topleft=(WINDOW_WIDTH//4 + i*150, WINDOW_HEIGHT//2 + 50)))
+        
+        # Text background
+        widgets.append(label(self.story_text_bg, center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 100)))
+        
+        # Text
+        lines = self.text_cache.wrap(self.pixel_font_small, STORY_TEXTS[page], 600)
+        for i, line in enumerate(lines):
+            text_surface = self.text_cache.render(self.pixel_font_small, line, True, (255, 255, 255))
+            widgets.append(label(text_surface, center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + i*30)))
+        
+        # Continue prompt (space only)
+        continue_text = self.text_cache.render(self.pixel_font_tiny, "Press SPACE to continue", True, (255, 255, 255))
+        widgets.append(label(continue_text, midtop=(WINDOW_WIDTH//2, WINDOW_HEIGHT - 100)))
+        return Screen(page, widgets)
+
+    def draw_story(self):
+        self.screen.fill((0, 0, 0))
+        self.ui("story", self.story_page, self.build_story).draw(self.screen)
+        
+        # Apply fade effect
+        if self.fade_alpha > 0:
+            self.lighting.apply_fade(self.screen, self.fade_alpha)
+            self.fade_alpha = max(0, self.fade_alpha - self.fade_speed)
+
+if __name__ == "__main__":
+    # The local game; main.py is the web server
+    Game().run()
@@ -1,39 +1,38 @@
 import pygame
+import assets
 from constants import *
+from simulation import PotionBody, WallBody
 
-class Potion:
+class Potion(PotionBody):
     """Represents a collectible star/potion in the game"""
+    __slots__ = ('image',)
+
     def __init__(self, x, y):
-        # Load and scale the image
-        self.image = pygame.image.load("assets/potion2.png").convert_alpha()
-        self.image = pygame.transform.scale(self.image, (POTION_SIZE, POTION_SIZE))
-        self.rect = self.image.get_rect(x=x, y=y)
-        
-        # Create smaller collision rect for better gameplay
-        shrink = 15
-        self.collision_rect = self.rect.inflate(-shrink*2, -shrink*2)
+        super().__init__(x, y)
 
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
+        # Shared, pre-scaled image
+        self.image = assets.load_image("assets/potion2.png", (POTION_SIZE, POTION_SIZE))
+
+    def draw(self, screen, offset=(0, 0)):
+        screen.blit(self.image, self.rect.move(offset))
 
-class Wall:
+def create_wall_image():
+    """Create the semi-transparent circle used to draw walls"""
+    image = pygame.Surface((WALL_SIZE, WALL_SIZE), pygame.SRCALPHA)
+    pygame.draw.circle(image, (0, 0, 0, 180),
+                       (WALL_SIZE//2, WALL_SIZE//2),
+                       WALL_SIZE//2)
+    return image
+
+class Wall(WallBody):
     """Represents an obstacle in the game"""
+    __slots__ = ('image',)
+
     def __init__(self, x, y):
-        # Create wall rectangle
-        self.rect = pygame.Rect(x, y, WALL_SIZE, WALL_SIZE)
-        
-        # Load and create circular wall image
-        background = pygame.image.load("assets/background.png").convert()
-        self.image = pygame.Surface((WALL_SIZE, WALL_SIZE), pygame.SRCALPHA)
-        
-        # Create circular mask
-        pygame.draw.circle(self.image, (0, 0, 0, 180), 
-                         (WALL_SIZE//2, WALL_SIZE//2), 
-                         WALL_SIZE//2)
-        
-        # Create smaller collision rect
-        shrink = 12
-        self.collision_rect = self.rect.inflate(-shrink*2, -shrink*2)
+        super().__init__(x, y)
+
+        # Circular wall image, shared by every wall
+        self.image = assets.get_surface("wall", create_wall_image)
 
     def draw(self, screen):
-        screen.blit(self.image, self.rect)
\ No newline at end of file
+        screen.blit(self.image, self.rect)
@@ -0,0 +1,162 @@
+import queue
+import sqlite3
+import threading
+import time
+from constants import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    mode TEXT NOT NULL,
+    player TEXT NOT NULL,
+    time_ms INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_mode ON scores (mode, time_ms);
+CREATE INDEX IF NOT EXISTS scores_by_player ON scores (player, mode, time_ms);
+CREATE TABLE IF NOT EXISTS seeds (
+    seed INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    issued_at REAL NOT NULL,
+    claimed_at REAL
+);
+"""
+
+class ScoreStore:
+    """Finish times kept in SQLite (WAL mode), written in batches by a background thread.
+
+    submit() never touches the disk: scores are queued and the writer
+    thread commits them in batches. best_time() answers from an in-memory
+    cache, so drawing a menu never waits on the database.
+    """
+    def __init__(self, path=LEADERBOARD_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.queue = queue.Queue()
+        self.best_times = {}
+
+        db = self.connection()
+        db.executescript(SCHEMA)
+        self.refresh_best_times(db)
+
+        self.writer = threading.Thread(target=self.write_loop, name="score-writer", daemon=True)
+        self.writer.start()
+
+    def connection(self):
+        """Return this thread's connection (sqlite connections can't be shared between threads)"""
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = self.local.db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def submit(self, mode, time_ms, player="player"):
+        """Queue a finish time to be saved"""
+        time_ms = int(round(time_ms))
+        if time_ms < self.best_times.get(mode, float('inf')):
+            self.best_times[mode] = time_ms
+        self.queue.put((mode, player, time_ms, time.time()))
+
+    def write_loop(self):
+        db = self.connection()
+        while True:
+            batch = [self.queue.get()]
+            # Take whatever else is waiting so it goes in the same transaction
+            while len(batch) < LEADERBOARD_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            rows = [row for row in batch if row is not None]
+            if rows:
+                with db:
+                    db.executemany("INSERT INTO scores (mode, player, time_ms, created_at) VALUES (?, ?, ?, ?)", rows)
+                # Other processes may share the database
+                self.refresh_best_times(db)
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                db.close()
+                return
+
+    def refresh_best_times(self, db):
+        for mode in SCORED_MODES:
+            (best,) = db.execute("SELECT MIN(time_ms) FROM scores WHERE mode = ?", (mode,)).fetchone()
+            if best is not None and best < self.best_time(mode):
+                self.best_times[mode] = best
+
+    def flush(self):
+        """Wait until every submitted score is committed"""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+
+    def best_time(self, mode):
+        """Best time in ms for mode, or inf if there is none (from memory, never blocks)"""
+        return self.best_times.get(mode, float('inf'))
+
+    def top(self, mode, limit=10):
+        """Fastest finishes for mode, fastest first"""
+        rows = self.connection().execute(
+            "SELECT player, time_ms, created_at FROM scores WHERE mode = ? ORDER BY time_ms LIMIT ?",
+            (mode, limit))
+        return [{'player': player, 'time_ms': time_ms, 'created_at': created_at}
+                for player, time_ms, created_at in rows]
+
+    def player_best(self, player, mode):
+        """A player's best time in ms for mode, or None"""
+        row = self.connection().execute(
+            "SELECT MIN(time_ms) FROM scores WHERE player = ? AND mode = ?", (player, mode)).fetchone()
+        return row[0]
+
+    # Seeds the server chose for a player's game. A replay is only scored
+    # on a seed issued to its player, and each seed only once, so nobody
+    # can pick an easy level or submit the same run twice.
+
+    def issue_seed(self, seed, player, mode):
+        """Record that seed was given to player for a game of mode"""
+        db = self.connection()
+        with db:
+            db.execute("INSERT OR IGNORE INTO seeds (seed, player, mode, issued_at) VALUES (?, ?, ?, ?)",
+                       (seed, player, mode, time.time()))
+
+    def seed_open(self, seed, player, mode):
+        """Whether seed was issued to player for mode and hasn't been claimed"""
+        row = self.connection().execute(
+            "SELECT 1 FROM seeds WHERE seed = ? AND player = ? AND mode = ? AND claimed_at IS NULL",
+            (seed, player, mode)).fetchone()
+        return row is not None
+
+    def claim_seed(self, seed, player, mode):
+        """Use up an open seed; False if it wasn't open, so only one claim ever succeeds"""
+        db = self.connection()
+        with db:
+            cursor = db.execute(
+                "UPDATE seeds SET claimed_at = ? WHERE seed = ? AND player = ? AND mode = ? AND claimed_at IS NULL",
+                (time.time(), seed, player, mode))
+        return cursor.rowcount == 1
+
+class NullScores:
+    """Stands in for the score store where finish times shouldn't be kept (benchmarks, agents)"""
+    def submit(self, mode, time_ms, player="player"):
+        pass
+
+    def best_time(self, mode):
+        return float('inf')
+
+# One store per process, shared by every game in it
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScoreStore()
+        return _store
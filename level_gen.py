@@ -0,0 +1,171 @@
+import queue
+import threading
+from collections import namedtuple
+import numpy
+import pygame
+from constants import *
+from broadphase import WallGrid
+from navigation import NavGrid, free_positions
+from simulation import PotionBody
+
+# Positions only; Game and Simulation turn them into objects
+Level = namedtuple('Level', ['walls', 'spawn', 'potions'])
+
+class LevelGenerator:
+    """Generates complete levels from its own seeded RNG, in bounded time.
+
+    Instead of rejection sampling, every placement picks uniformly from an
+    occupancy grid of the positions still allowed: walls avoid the previous
+    level's walls, the spawn is the free position nearest the center and
+    potions are Poisson-disk sampled MIN_STAR_DISTANCE apart. Layouts where
+    a potion can't be reached from the spawn are thrown away.
+
+    Hard levels add obstacles along the edges and in clusters, and may
+    reuse the previous level's spots, as clusters leave little room.
+    """
+    def __init__(self, seed=None):
+        self.rng = numpy.random.default_rng(seed)
+
+    def pick(self, free):
+        """Return a random (x, y) where free is True, or None"""
+        choices = numpy.flatnonzero(free)
+        if not len(choices):
+            return None
+        y, x = divmod(int(choices[self.rng.integers(len(choices))]), free.shape[1])
+        return x, y
+
+    def place_walls(self, old_walls):
+        # Walls may overlap each other, so every wall draws from the same grid
+        choices = numpy.flatnonzero(free_positions(WALL_SIZE, old_walls))
+        if not len(choices):
+            return None
+        width = WINDOW_WIDTH - WALL_SIZE + 1
+        picks = choices[self.rng.integers(len(choices), size=WALL_COUNT)]
+        return [(int(index % width), int(index // width)) for index in picks]
+
+    def place_hard_walls(self):
+        walls = self.place_walls(())
+        right, bottom = WINDOW_WIDTH - WALL_SIZE, WINDOW_HEIGHT - WALL_SIZE
+        # Border obstacles
+        for side in self.rng.integers(4, size=BORDER_OBSTACLES):
+            if side == 0:  # Top
+                x, y = self.rng.integers(right + 1), self.rng.integers(100)
+            elif side == 1:  # Right
+                x, y = WINDOW_WIDTH - 50, self.rng.integers(bottom + 1)
+            elif side == 2:  # Bottom
+                x, y = self.rng.integers(right + 1), WINDOW_HEIGHT - 50
+            else:  # Left
+                x, y = 0, self.rng.integers(bottom + 1)
+            walls.append((int(x), int(y)))
+
+        # Obstacle clusters
+        centers = self.rng.integers((WALL_SIZE, WALL_SIZE), (right + 1, bottom + 1), size=(CLUSTER_COUNT, 2))
+        offsets = self.rng.integers(-WALL_SIZE * 2, WALL_SIZE * 2 + 1, size=(CLUSTER_COUNT, OBSTACLES_PER_CLUSTER, 2))
+        positions = numpy.clip(centers[:, None] + offsets, 0, (right, bottom)).reshape(-1, 2)
+        walls.extend((int(x), int(y)) for x, y in positions)
+        return walls
+
+    def place_potions(self, blocked):
+        free = free_positions(POTION_SIZE, blocked)
+        # Offsets closer than MIN_STAR_DISTANCE, stamped around each potion
+        ys, xs = numpy.ogrid[-MIN_STAR_DISTANCE:MIN_STAR_DISTANCE + 1, -MIN_STAR_DISTANCE:MIN_STAR_DISTANCE + 1]
+        disk = xs ** 2 + ys ** 2 < MIN_STAR_DISTANCE ** 2
+        potions = []
+        for _ in range(3):
+            position = self.pick(free)
+            if position is None:
+                return None
+            potions.append(position)
+            # Nothing else may start within MIN_STAR_DISTANCE of this potion
+            x, y = position
+            top, left = max(y - MIN_STAR_DISTANCE, 0), max(x - MIN_STAR_DISTANCE, 0)
+            window = free[top:y + MIN_STAR_DISTANCE + 1, left:x + MIN_STAR_DISTANCE + 1]
+            window &= ~disk[top - (y - MIN_STAR_DISTANCE):, left - (x - MIN_STAR_DISTANCE):][:window.shape[0], :window.shape[1]]
+        return potions
+
+    def next_level(self, old_walls=(), hard=False):
+        """Return a complete Level whose walls don't overlap old_walls (rects)"""
+        for attempt in range(LEVEL_ATTEMPTS):
+            if hard:
+                walls = self.place_hard_walls()
+            else:
+                # Last resort: allow walls where the previous level had them
+                walls = self.place_walls(old_walls if attempt < LEVEL_ATTEMPTS - 1 else ())
+            if walls is None:
+                continue
+            wall_rects = [pygame.Rect(x, y, WALL_SIZE, WALL_SIZE) for x, y in walls]
+            navigation = NavGrid(wall_rects)
+            spawn = navigation.nearest_free((WINDOW_WIDTH // 2 - PLAYER_SIZE // 2, WINDOW_HEIGHT // 2 - PLAYER_SIZE // 2))
+            if spawn is None:
+                continue
+            # Keep potions off the walls and out of the spawn area
+            potions = self.place_potions(wall_rects + [pygame.Rect(spawn, (PLAYER_SIZE, PLAYER_SIZE))])
+            if potions is None:
+                continue
+            if not navigation.all_reachable(spawn, [PotionBody(x, y).collision_rect for x, y in potions]):
+                continue
+            return Level(walls, spawn, potions)
+        raise RuntimeError("could not generate a level")
+
+    def move_walls_off(self, level, old_walls):
+        """Re-place the walls of level that overlap old_walls, clear of its spawn and potions"""
+        blocked = list(old_walls)
+        blocked.append(pygame.Rect(level.spawn, (PLAYER_SIZE, PLAYER_SIZE)))
+        blocked.extend(pygame.Rect(position, (POTION_SIZE, POTION_SIZE)) for position in level.potions)
+        free = free_positions(WALL_SIZE, blocked)
+
+        old = WallGrid(old_walls)
+        walls = []
+        for x, y in level.walls:
+            if old.collides(pygame.Rect(x, y, WALL_SIZE, WALL_SIZE)):
+                position = self.pick(free)
+                if position is None:
+                    return None
+                x, y = position
+            walls.append((x, y))
+
+        navigation = NavGrid([pygame.Rect(x, y, WALL_SIZE, WALL_SIZE) for x, y in walls])
+        if not navigation.all_reachable(level.spawn, [PotionBody(x, y).collision_rect for x, y in level.potions]):
+            return None
+        return Level(walls, level.spawn, level.potions)
+
+def overlaps(level, old_walls):
+    old = WallGrid(old_walls)
+    return any(old.collides(pygame.Rect(x, y, WALL_SIZE, WALL_SIZE)) for x, y in level.walls)
+
+class LevelPool:
+    """Keeps up to size levels generated ahead of time by a background thread"""
+    def __init__(self, size=LEVEL_POOL_SIZE, seed=None):
+        self.generator = LevelGenerator(seed)
+        self.levels = queue.Queue(maxsize=size)
+        self.thread = threading.Thread(target=self.fill, name="level-pool", daemon=True)
+        self.thread.start()
+
+    def fill(self):
+        generator = LevelGenerator(self.generator.rng.integers(2 ** 63))
+        while True:
+            self.levels.put(generator.next_level())
+
+    def next_level(self, old_walls=(), hard=False):
+        """Return a ready level that doesn't overlap old_walls, generating one only if none is ready"""
+        if hard:
+            # Only normal levels are made ahead of time
+            return self.generator.next_level(old_walls, hard=True)
+        try:
+            level = self.levels.get_nowait()
+        except queue.Empty:
+            return self.generator.next_level(old_walls)
+        if overlaps(level, old_walls):
+            level = self.generator.move_walls_off(level, old_walls) or self.generator.next_level(old_walls)
+        return level
+
+# Levels for games that weren't given a generator, shared by the process
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_level_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LevelPool()
+        return _pool
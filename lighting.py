@@ -0,0 +1,72 @@
+import pygame
+import assets
+from constants import *
+
+try:
+    import numpy
+except ImportError:  # Soft light edges need numpy, hard edges don't
+    numpy = None
+
+def create_overlay(alpha, size=(WINDOW_WIDTH, WINDOW_HEIGHT)):
+    """Create a black surface blended with a single surface-wide alpha"""
+    overlay = pygame.Surface(size)
+    overlay.fill((0, 0, 0))
+    overlay.set_alpha(alpha)
+    return overlay
+
+def create_light_mask(radius, darkness_alpha, falloff=0):
+    """Create a darkness mask twice the window size with a light hole in the middle.
+
+    Blitting it at (x - WINDOW_WIDTH, y - WINDOW_HEIGHT) covers the whole
+    window and centers the light on (x, y). With falloff > 0 the edge of
+    the light fades out over that many pixels instead of being cut sharply.
+    """
+    width, height = WINDOW_WIDTH * 2, WINDOW_HEIGHT * 2
+    mask = pygame.Surface((width, height), pygame.SRCALPHA)
+    mask.fill((0, 0, 0, darkness_alpha))
+
+    if falloff > 0 and numpy is not None:
+        xs = numpy.arange(width, dtype=numpy.float32) - WINDOW_WIDTH
+        ys = numpy.arange(height, dtype=numpy.float32) - WINDOW_HEIGHT
+        distance = numpy.hypot(xs[:, None], ys[None, :])
+        fade = numpy.clip((distance - (radius - falloff)) / falloff, 0, 1)
+        alpha = pygame.surfarray.pixels_alpha(mask)
+        alpha[:] = (fade * darkness_alpha).astype(numpy.uint8)
+        del alpha  # Unlock the surface
+    else:
+        # Drawing onto a per-pixel alpha surface replaces the pixels, leaving a hole
+        pygame.draw.circle(mask, (0, 0, 0, 0), (WINDOW_WIDTH, WINDOW_HEIGHT), radius)
+    return mask
+
+class Lighting:
+    """Darkness and dimming overlays built once per process and reused every frame"""
+    def __init__(self, falloff=LIGHT_FALLOFF):
+        self.light_mask = assets.get_surface(
+            ("light", LIGHT_RADIUS, LIGHT_DARKNESS_ALPHA, falloff),
+            lambda: create_light_mask(LIGHT_RADIUS, LIGHT_DARKNESS_ALPHA, falloff))
+        self.blind_overlay = assets.get_surface(("overlay", BLIND_DARKNESS_ALPHA), lambda: create_overlay(BLIND_DARKNESS_ALPHA))
+        self.dim_overlay = assets.get_surface(("overlay", DIM_OVERLAY_ALPHA), lambda: create_overlay(DIM_OVERLAY_ALPHA))
+        # Its alpha is set right before every blit, so it can be shared too
+        self.fade_overlay = assets.get_surface("fade", lambda: create_overlay(255))
+
+    def apply_light(self, screen, center):
+        """Darken everything except a circle around center"""
+        screen.blit(self.light_mask, (center[0] - WINDOW_WIDTH, center[1] - WINDOW_HEIGHT))
+
+    def light_rect(self, center):
+        """Return the screen area that changes when the light moves"""
+        return pygame.Rect(0, 0, LIGHT_RADIUS * 2 + 2, LIGHT_RADIUS * 2 + 2).move(
+            center[0] - LIGHT_RADIUS - 1, center[1] - LIGHT_RADIUS - 1)
+
+    def apply_blind(self, screen):
+        """Darken the whole screen for BLIND mode"""
+        screen.blit(self.blind_overlay, (0, 0))
+
+    def apply_dim(self, screen):
+        """Dim the screen behind the game over / win text"""
+        screen.blit(self.dim_overlay, (0, 0))
+
+    def apply_fade(self, screen, alpha):
+        """Fade the screen towards black by alpha (0-255)"""
+        self.fade_overlay.set_alpha(alpha)
+        screen.blit(self.fade_overlay, (0, 0))
@@ -0,0 +1,165 @@
+import numpy
+from constants import *
+
+# The player moves 5 pixels per tick in any of 8 directions and its
+# top-left always stays on that lattice, so a level's walkable space is a
+# small grid of lattice cells: cell (column, row) is the player at
+# (column * STEP, row * STEP). One BFS step between cells is one tick.
+STEP = 5
+
+# Input for moving one cell by (column, row) offset
+DIRECTIONS = {
+    (-1, 0): INPUT_LEFT, (1, 0): INPUT_RIGHT, (0, -1): INPUT_UP, (0, 1): INPUT_DOWN,
+    (-1, -1): INPUT_LEFT | INPUT_UP, (1, -1): INPUT_RIGHT | INPUT_UP,
+    (-1, 1): INPUT_LEFT | INPUT_DOWN, (1, 1): INPUT_RIGHT | INPUT_DOWN,
+}
+
+def free_positions(size, rects, width=WINDOW_WIDTH, height=WINDOW_HEIGHT):
+    """Occupancy grid of top-left positions where a size x size square fits without overlapping rects.
+
+    Indexed [y, x]; a square at (x, y) overlaps a rect exactly when
+    pygame's colliderect would say so.
+    """
+    free = numpy.ones((height - size + 1, width - size + 1), dtype=bool)
+    for rect in rects:
+        free[max(rect.top - size + 1, 0):max(rect.bottom, 0),
+             max(rect.left - size + 1, 0):max(rect.right, 0)] = False
+    return free
+
+def dilate(cells):
+    """Grow a boolean grid by one cell in all 8 directions"""
+    rows = cells.copy()
+    rows[:, 1:] |= cells[:, :-1]
+    rows[:, :-1] |= cells[:, 1:]
+    grown = rows.copy()
+    grown[1:] |= rows[:-1]
+    grown[:-1] |= rows[1:]
+    return grown
+
+class NavGrid:
+    """Where the player can stand in one level, with path queries.
+
+    Built once per level from the wall rects (the same rects movement
+    collides with). Distances are in ticks, so they double as
+    shortest-path lengths for bots and difficulty scores.
+    """
+    def __init__(self, wall_rects):
+        self.free = numpy.ascontiguousarray(free_positions(PLAYER_SIZE, wall_rects)[::STEP, ::STEP])
+        self.rows, self.columns = self.free.shape
+        self.fields = {}
+        self.nearest = None  # Built on the first lookup of a blocked cell
+
+    def nearest_free_cells(self):
+        """Distance transform: for every cell, the flat index of a nearest free cell (-1 if none)"""
+        nearest = numpy.where(self.free.ravel(), numpy.arange(self.free.size), -1).reshape(self.free.shape)
+        assigned = self.free.copy()
+        while not assigned.all() and assigned.any():
+            # Each pass hands the assignment on to unassigned neighbours,
+            # straight neighbours first so ties don't end up in a corner
+            taken = assigned.copy()
+            for dx, dy in DIRECTIONS:
+                target = (slice(max(dy, 0), self.rows + min(dy, 0)), slice(max(dx, 0), self.columns + min(dx, 0)))
+                source = (slice(max(-dy, 0), self.rows + min(-dy, 0)), slice(max(-dx, 0), self.columns + min(-dx, 0)))
+                take = ~taken[target] & assigned[source]
+                nearest[target][take] = nearest[source][take]
+                taken[target] |= take
+            assigned = taken
+        return nearest
+
+    def cell(self, position):
+        """Cell of a player top-left position, clamped to the grid"""
+        x, y = position
+        return (min(max(round(x / STEP), 0), self.columns - 1),
+                min(max(round(y / STEP), 0), self.rows - 1))
+
+    def position(self, cell):
+        return cell[0] * STEP, cell[1] * STEP
+
+    def is_free(self, position):
+        column, row = self.cell(position)
+        return bool(self.free[row, column])
+
+    def nearest_free(self, position):
+        """Free player position nearest to position, or None if the level has none"""
+        column, row = self.cell(position)
+        if self.free[row, column]:
+            return self.position((column, row))
+        if self.nearest is None:
+            self.nearest = self.nearest_free_cells()
+        index = self.nearest[row, column]
+        if index < 0:
+            return None
+        return self.position(divmod(int(index), self.columns)[::-1])
+
+    def distances_from(self, position):
+        """Ticks from position to every cell (-1 where unreachable), computed once per cell"""
+        start = self.cell(position)
+        field = self.fields.get(start)
+        if field is None:
+            field = numpy.full(self.free.shape, -1, dtype=numpy.int32)
+            frontier = numpy.zeros(self.free.shape, dtype=bool)
+            if self.free[start[1], start[0]]:
+                frontier[start[1], start[0]] = True
+            unseen = self.free & ~frontier
+            ticks = 0
+            # BFS as a wavefront over the whole grid
+            while frontier.any():
+                field[frontier] = ticks
+                ticks += 1
+                frontier = dilate(frontier)
+                frontier &= unseen
+                unseen &= ~frontier
+            self.fields[start] = field
+        return field
+
+    def potion_cells(self, potion_rect):
+        """Cells where the player touches a potion's collision rect"""
+        left = -((potion_rect.left - PLAYER_SIZE + 1) // -STEP)
+        top = -((potion_rect.top - PLAYER_SIZE + 1) // -STEP)
+        right = -(potion_rect.right // -STEP)
+        bottom = -(potion_rect.bottom // -STEP)
+        cells = numpy.zeros(self.free.shape, dtype=bool)
+        cells[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)] = True
+        return cells & self.free
+
+    def ticks_to(self, start, target_cells):
+        """Fewest ticks from start to any of target_cells, or None if none can be reached"""
+        reached = self.distances_from(start)[target_cells]
+        reached = reached[reached >= 0]
+        return int(reached.min()) if len(reached) else None
+
+    def potion_distances(self, spawn, potion_rects):
+        """Fewest ticks from spawn to each potion (None for unreachable ones)"""
+        return [self.ticks_to(spawn, self.potion_cells(rect)) for rect in potion_rects]
+
+    def all_reachable(self, spawn, potion_rects):
+        return None not in self.potion_distances(spawn, potion_rects)
+
+    def next_input(self, position, goal):
+        """INPUT_* bits for the first tick of a shortest path from position to goal (0 if none)"""
+        field = self.distances_from(goal)
+        column, row = self.cell(position)
+        here = field[row, column]
+        if here <= 0:
+            return 0
+        for (dx, dy), inputs in DIRECTIONS.items():
+            x, y = column + dx, row + dy
+            if 0 <= x < self.columns and 0 <= y < self.rows and field[y, x] == here - 1:
+                return inputs
+        return 0
+
+    def path(self, start, goal):
+        """Player positions along a shortest path from start to goal, or None"""
+        field = self.distances_from(goal)
+        column, row = self.cell(start)
+        if field[row, column] < 0:
+            return None
+        cells = [(column, row)]
+        while field[row, column] > 0:
+            for dx, dy in DIRECTIONS:
+                x, y = column + dx, row + dy
+                if 0 <= x < self.columns and 0 <= y < self.rows and field[y, x] == field[row, column] - 1:
+                    column, row = x, y
+                    break
+            cells.append((column, row))
+        return [self.position(cell) for cell in cells]
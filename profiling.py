@@ -0,0 +1,108 @@
+import time
+import numpy
+from constants import *
+
+# Stages of a frame (or of a worker tick), in the order they run
+PHASES = ('input', 'move', 'lava', 'potions', 'draw', 'present', 'wait')
+# Phases that are the frame waiting rather than working
+IDLE_PHASES = ('wait',)
+
+class FrameProfiler:
+    """Named phase timers around the stages of each frame, kept for the last size frames.
+
+    mark(phase) charges the time since the previous mark to phase, so the
+    hot path only calls perf_counter once per stage. While disabled every
+    call returns straight away, and only frames begun while enabled are
+    timed, so enabling it mid-frame doesn't charge a stale mark to a phase.
+    """
+    def __init__(self, size=PROFILER_FRAMES, enabled=False):
+        self.enabled = enabled
+        self.columns = {phase: i for i, phase in enumerate(PHASES)}
+        self.frames = numpy.zeros((size, len(PHASES)))  # Ring buffer of seconds per phase
+        self.frame_count = 0
+        self.totals = [0.0] * len(PHASES)  # Seconds per phase over every frame
+        self.current = [0.0] * len(PHASES)
+        self.last = 0.0
+        self.timing = False  # Whether the current frame began while enabled
+
+    def begin_frame(self):
+        self.timing = self.enabled
+        if self.timing:
+            self.current = [0.0] * len(PHASES)
+            self.last = time.perf_counter()
+
+    def mark(self, phase):
+        if self.timing:
+            now = time.perf_counter()
+            self.current[self.columns[phase]] += now - self.last
+            self.last = now
+
+    def end_frame(self):
+        if self.timing:
+            self.timing = False
+            self.frames[self.frame_count % len(self.frames)] = self.current
+            self.frame_count += 1
+            for i, seconds in enumerate(self.current):
+                self.totals[i] += seconds
+
+    def summary(self):
+        """p50/p95/p99 in ms of each phase and of the busy part of the frame over the kept frames"""
+        frames = self.frames[:min(self.frame_count, len(self.frames))] * 1000
+        busy = frames[:, [self.columns[phase] for phase in PHASES if phase not in IDLE_PHASES]].sum(axis=1)
+
+        def percentiles(values):
+            if not len(values):
+                return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+            p50, p95, p99 = numpy.percentile(values, (50, 95, 99))
+            return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+        return {
+            'frames': self.frame_count,
+            'frame': percentiles(busy),
+            'phases': {phase: dict(percentiles(frames[:, i]), total_ms=self.totals[i] * 1000)
+                       for i, phase in enumerate(PHASES)},
+        }
+
+# The process's profiler; Simulation, Game and session workers all report to it
+profiler = FrameProfiler()
+
+def format_metrics(workers):
+    """Prometheus text exposition of the stats returned by SessionPool.stats()"""
+    lines = [
+        "# HELP moon_frame_phase_ms Time spent in each phase of recent worker ticks",
+        "# TYPE moon_frame_phase_ms summary",
+    ]
+    for stats in workers:
+        profile = stats.get('profile')
+        if not profile:
+            continue
+        for phase, values in profile['phases'].items():
+            labels = f'worker="{stats["worker"]}",phase="{phase}"'
+            for quantile in ('p50', 'p95', 'p99'):
+                lines.append(f'moon_frame_phase_ms{{{labels},quantile="0.{quantile[1:]}"}} {values[quantile]:.4f}')
+            lines.append(f'moon_frame_phase_ms_sum{{{labels}}} {values["total_ms"]:.4f}')
+            lines.append(f'moon_frame_phase_ms_count{{{labels}}} {profile["frames"]}')
+
+    lines += [
+        "# HELP moon_frame_busy_ms Time recent worker ticks spent working",
+        "# TYPE moon_frame_busy_ms gauge",
+    ]
+    for stats in workers:
+        profile = stats.get('profile')
+        if profile:
+            for quantile, value in profile['frame'].items():
+                lines.append(f'moon_frame_busy_ms{{worker="{stats["worker"]}",quantile="0.{quantile[1:]}"}} {value:.4f}')
+
+    gauges = [
+        ('sessions', 'moon_sessions', 'gauge', "Sessions hosted by the worker"),
+        ('ticks', 'moon_ticks_total', 'counter', "Ticks run by the worker"),
+        ('skipped_ticks', 'moon_skipped_ticks_total', 'counter', "Ticks dropped because the worker fell behind"),
+        ('tick_lag_avg_ms', 'moon_tick_lag_ms', 'gauge', "Average delay of tick starts"),
+        ('session_bytes', 'moon_session_bytes', 'gauge', "Bytes held by the worker's sessions"),
+    ]
+    for key, name, kind, help_text in gauges:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for stats in workers:
+            if key in stats:
+                lines.append(f'{name}{{worker="{stats["worker"]}"}} {stats[key]}')
+    return "\n".join(lines) + "\n"
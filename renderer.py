@@ -0,0 +1,99 @@
+import pygame
+from constants import *
+
+class LayeredRenderer:
+    """Caches the parts of the level that never move so each frame costs a constant number of blits.
+
+    The lava layer is the background with every wall drawn on it, built
+    once per level, and each new lava piece is stamped onto it once, in
+    trail order, so it looks exactly like drawing background, walls and the
+    whole trail every frame. The player, potions and HUD are drawn on top
+    by the caller.
+    """
+    def __init__(self, background):
+        self.background = background
+        self.walls = []
+        self.lava_layer = background.copy()
+        self.lava_drawn = 0
+        self.trail_resets = 0
+
+    def build_level(self, walls):
+        """Render the background and walls of a new level"""
+        self.walls = walls
+        self.reset_lava()
+
+    def reset_lava(self):
+        # Redrawn rather than copied from a saved layer, which would cost
+        # another screen-sized surface per game
+        self.lava_layer.blit(self.background, (0, 0))
+        for wall in self.walls:
+            wall.draw(self.lava_layer)
+        self.lava_drawn = 0
+
+    def sync_lava(self, player):
+        """Stamp lava pieces added since the last call onto the lava layer"""
+        if player.trail_resets != self.trail_resets or len(player.lava_trail) < self.lava_drawn:
+            self.trail_resets = player.trail_resets
+            self.reset_lava()
+
+        trail = player.lava_trail
+        for i in range(self.lava_drawn, len(trail)):
+            self.lava_layer.blit(player.lava_image, trail[i])
+        self.lava_drawn = len(trail)
+
+    def draw_world(self, screen, player):
+        """Draw background, walls and lava trail in a single blit"""
+        self.sync_lava(player)
+        screen.blit(self.lava_layer, (0, 0))
+
+class ChunkRenderer:
+    """Draws the part of a World under the camera from cached per-chunk layers.
+
+    Each chunk near the camera gets its own layer with the background,
+    walls and lava stamped on it the same way LayeredRenderer does, so a
+    frame costs a blit per visible chunk however big the world or long
+    the trail gets. Layers that scroll away are dropped.
+    """
+    def __init__(self, background, wall_image, lava_image):
+        self.background = background
+        self.wall_image = wall_image
+        self.lava_image = lava_image
+        self.layers = {}  # Chunk key -> [surface, lava values drawn]
+        self.lava_resets = 0
+
+    def build_layer(self, chunk):
+        surface = pygame.Surface((WORLD_CHUNK_SIZE, WORLD_CHUNK_SIZE))
+        # The chunk size divides the window size, so one blit of the tiled background covers it
+        surface.blit(self.background, (-(chunk.origin[0] % WINDOW_WIDTH), -(chunk.origin[1] % WINDOW_HEIGHT)))
+        for rect in chunk.wall_rects:
+            surface.blit(self.wall_image, (rect.x - chunk.origin[0], rect.y - chunk.origin[1]))
+        return [surface, 0]
+
+    def draw(self, screen, world, camera, player):
+        """Draw background, walls and lava trail for the view at camera"""
+        if world.lava_resets != self.lava_resets:
+            self.lava_resets = world.lava_resets
+            self.layers.clear()
+
+        view = screen.get_rect().move(camera)
+        for key in world.chunk_keys(view):
+            chunk = world.chunk(key)
+            layer = self.layers.get(key)
+            if layer is None:
+                layer = self.layers[key] = self.build_layer(chunk)
+            surface, drawn = layer
+            lava = chunk.lava
+            for i in range(drawn, len(lava), 2):
+                surface.blit(self.lava_image, (lava[i], lava[i + 1]))
+            layer[1] = len(lava)
+            screen.blit(surface, (chunk.origin[0] - camera[0], chunk.origin[1] - camera[1]))
+
+        # The newest pieces haven't been handed to a chunk yet
+        for x, y in player.recent_lava():
+            screen.blit(self.lava_image, (x - camera[0], y - camera[1]))
+
+        keep = set(world.chunk_keys(view.inflate(2 * WORLD_ACTIVE_MARGIN * WORLD_CHUNK_SIZE,
+                                                 2 * WORLD_ACTIVE_MARGIN * WORLD_CHUNK_SIZE)))
+        for key in list(self.layers):
+            if key not in keep:
+                del self.layers[key]
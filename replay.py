@@ -0,0 +1,151 @@
+import mmap
+import multiprocessing
+import struct
+from constants import *
+from simulation import Simulation
+
+# A replay is a header, then the input of every tick as runs of
+# varint((run length << 4) | INPUT_* bitmask), then an end marker (a zero
+# varint), the outcome byte and the tick count. Inputs rarely change, so a
+# second of play usually takes a few bytes.
+HEADER = struct.Struct("<4sBBQ")  # magic, version, mode, seed
+MAGIC = b"MORP"
+VERSION = 1
+MODES = ['NORMAL', 'BLIND']
+OUTCOME_LOST = 0
+OUTCOME_WON = 1
+OUTCOME_UNFINISHED = 2
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, offset):
+    """Return (value, next offset)"""
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+class ReplayRecorder:
+    """Appends a game's per-tick inputs to a replay file as it is played"""
+    def __init__(self, path, seed, mode):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, MODES.index(mode), seed))
+        self.inputs = None
+        self.run = 0
+        self.ticks = 0
+
+    def record(self, inputs):
+        """Record the input used for one tick"""
+        inputs &= 0xf
+        self.ticks += 1
+        if inputs == self.inputs:
+            self.run += 1
+            return
+        self.write_run()
+        self.inputs = inputs
+        self.run = 1
+
+    def write_run(self):
+        if self.run:
+            out = bytearray()
+            write_varint(out, self.run << 4 | self.inputs)
+            self.file.write(out)
+
+    def finish(self, outcome):
+        """Write the outcome and close the file"""
+        self.write_run()
+        out = bytearray([0, outcome])  # End marker and outcome
+        write_varint(out, self.ticks)
+        self.file.write(out)
+        self.file.close()
+
+    def close(self):
+        """Close an unfinished replay"""
+        if not self.file.closed:
+            self.finish(OUTCOME_UNFINISHED)
+
+class Replay:
+    def __init__(self, mode, seed, runs, outcome, ticks):
+        self.mode = mode
+        self.seed = seed
+        self.runs = runs  # [(inputs, run length)]
+        self.outcome = outcome
+        self.ticks = ticks
+
+    @property
+    def elapsed_ms(self):
+        """Claimed finish time"""
+        return self.ticks * FIXED_TICK_MS
+
+def parse_replay(data):
+    """Parse replay bytes (or any buffer, such as an mmap)"""
+    if len(data) < HEADER.size:
+        raise ValueError("replay is too short")
+    magic, version, mode, seed = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or mode >= len(MODES):
+        raise ValueError("not a supported replay")
+
+    runs = []
+    offset = HEADER.size
+    try:
+        while True:
+            value, offset = read_varint(data, offset)
+            if value == 0:
+                break
+            runs.append((value & 0xf, value >> 4))
+        outcome = data[offset]
+        ticks, offset = read_varint(data, offset + 1)
+    except IndexError:
+        raise ValueError("replay is truncated") from None
+    return Replay(MODES[mode], seed, runs, outcome, ticks)
+
+def read_replay(path):
+    """Read a replay file through a memory map"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return parse_replay(data)
+
+def verify_replay(replay):
+    """Re-simulate a replay headlessly; returns (valid, reason)"""
+    # Checked before simulating, so a hostile replay can't make us run for long
+    if replay.ticks > REPLAY_MAX_TICKS:
+        return False, f"claims {replay.ticks} ticks, more than the limit of {REPLAY_MAX_TICKS}"
+    recorded = sum(run for _, run in replay.runs)
+    if recorded != replay.ticks:
+        return False, f"claims {replay.ticks} ticks but has {recorded}"
+
+    sim = Simulation.new_game(replay.seed)
+    ticks = 0
+    for inputs, run in replay.runs:
+        for _ in range(run):
+            if sim.finished:
+                return False, f"inputs continue after the game ended on tick {ticks}"
+            if ticks >= replay.ticks:
+                return False, f"claims {replay.ticks} ticks but has more"
+            sim.step(inputs)
+            ticks += 1
+
+    outcome = OUTCOME_WON if sim.won and not sim.game_over else OUTCOME_LOST if sim.finished else OUTCOME_UNFINISHED
+    if outcome != replay.outcome:
+        return False, f"claims outcome {replay.outcome} but re-simulation gives {outcome}"
+    return True, "ok"
+
+def verify_file(path):
+    try:
+        replay = read_replay(path)
+    except (OSError, ValueError) as e:
+        return path, False, str(e)
+    valid, reason = verify_replay(replay)
+    return path, valid, reason
+
+def verify_many(paths, processes=None):
+    """Verify replay files across a process pool; yields (path, valid, reason)"""
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        yield from pool.imap_unordered(verify_file, paths, chunksize=16)
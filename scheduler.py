@@ -0,0 +1,149 @@
+import asyncio
+import itertools
+import math
+from constants import *
+
+class TickStats:
+    """Timing statistics for one scheduled game"""
+    def __init__(self):
+        self.ticks = 0
+        self.frames = 0
+        self.skipped_frames = 0  # Frames not drawn because ticks fell behind
+        self.overruns = 0        # Times the backlog exceeded MAX_TICK_BACKLOG
+        self.dropped_ticks = 0   # Ticks thrown away by those overruns
+        self.lag_max = 0.0
+        # Running mean/variance of how late each wake-up was (Welford's method)
+        self.wakeups = 0
+        self.lag_mean = 0.0
+        self.lag_m2 = 0.0
+        self.error = None  # repr of the exception that stopped the game, if any
+
+    def record_lag(self, lag):
+        self.wakeups += 1
+        delta = lag - self.lag_mean
+        self.lag_mean += delta / self.wakeups
+        self.lag_m2 += delta * (lag - self.lag_mean)
+        self.lag_max = max(self.lag_max, lag)
+
+    def as_dict(self):
+        variance = self.lag_m2 / self.wakeups if self.wakeups else 0.0
+        return {
+            'ticks': self.ticks,
+            'frames': self.frames,
+            'skipped_frames': self.skipped_frames,
+            'overruns': self.overruns,
+            'dropped_ticks': self.dropped_ticks,
+            'lag_mean_ms': self.lag_mean * 1000,
+            'lag_max_ms': self.lag_max * 1000,
+            'jitter_ms': math.sqrt(variance) * 1000,
+            'error': self.error,
+        }
+
+class ScheduledGame:
+    def __init__(self, game, on_frame):
+        self.game = game
+        self.on_frame = on_frame
+        self.inputs = 0
+        self.stats = TickStats()
+        self.task = None
+
+class TickScheduler:
+    """Drives many games from one asyncio event loop at a fixed tick rate.
+
+    Each game is an object with update_game(inputs) and draw_game(), like an
+    offscreen Game or a session worker's WorkerSessions. Ticks use fixed-timestep accumulation, every tick is
+    followed by an await so other coroutines (HTTP input, frame output,
+    score saving) can run, and a game that needed more than one tick to
+    catch up skips drawing that frame.
+
+    A game whose update, draw or on_frame raises stops ticking; the
+    exception is kept in its stats, and the other games carry on.
+    """
+    def __init__(self, tick_rate=SESSION_TICK_RATE, render=True):
+        self.interval = 1 / tick_rate
+        self.render = render
+        self.games = {}
+        self.ids = itertools.count()
+
+    def add(self, game, on_frame=None):
+        """Start ticking game and return its id.
+
+        on_frame(game) is called after each drawn frame and may be a coroutine.
+        Must be called from inside the running event loop.
+        """
+        game_id = next(self.ids)
+        entry = self.games[game_id] = ScheduledGame(game, on_frame)
+        entry.task = asyncio.get_running_loop().create_task(self.drive(entry))
+        return game_id
+
+    def remove(self, game_id):
+        entry = self.games.pop(game_id)
+        entry.task.cancel()
+
+    def set_input(self, game_id, inputs):
+        """Set the INPUT_* bitmask used for every tick until the next call"""
+        self.games[game_id].inputs = inputs
+
+    def stats(self):
+        return {game_id: entry.stats.as_dict() for game_id, entry in self.games.items()}
+
+    async def stop(self):
+        """Stop every game and return their final stats"""
+        stats = self.stats()
+        tasks = [entry.task for entry in self.games.values()]
+        self.games.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return stats
+
+    async def drive(self, entry):
+        try:
+            await self.tick_loop(entry)
+        except Exception as e:
+            # Otherwise the task would end silently and the game just freeze
+            entry.stats.error = repr(e)
+
+    async def tick_loop(self, entry):
+        loop = asyncio.get_running_loop()
+        interval = self.interval
+        stats = entry.stats
+        accumulator = 0.0
+        last = loop.time()
+        wake_at = last
+
+        while True:
+            now = loop.time()
+            stats.record_lag(max(0.0, now - wake_at))
+            accumulator += now - last
+            last = now
+
+            # Too far behind to catch up: drop the backlog instead of bursting
+            if accumulator > interval * MAX_TICK_BACKLOG:
+                dropped = int(accumulator / interval) - 1
+                stats.overruns += 1
+                stats.dropped_ticks += dropped
+                accumulator -= dropped * interval
+
+            steps = 0
+            while accumulator >= interval:
+                entry.game.update_game(entry.inputs)
+                accumulator -= interval
+                stats.ticks += 1
+                steps += 1
+                await asyncio.sleep(0)
+
+            if steps > 1:
+                stats.skipped_frames += 1
+            elif steps == 1 and self.render:
+                entry.game.draw_game()
+                stats.frames += 1
+                if entry.on_frame is not None:
+                    result = entry.on_frame(entry.game)
+                    if asyncio.iscoroutine(result):
+                        await result
+
+            # Sleep until the next tick is due
+            delay = interval - accumulator
+            wake_at = loop.time() + delay
+            await asyncio.sleep(delay)
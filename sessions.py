@@ -0,0 +1,378 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import uuid
+from io import BytesIO
+from constants import *
+
+class Session:
+    """One game hosted by a worker process, drawn offscreen on demand"""
+    def __init__(self, session_id, mode, seed, player):
+        import pygame
+        from game import Game
+        from level_gen import LevelGenerator
+        from replay import ReplayRecorder
+
+        # Every session has a seed so its replay can be re-simulated
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.game = Game(screen=pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)),
+                         levels=LevelGenerator(seed), player_name=player)
+        self.game.mode = mode
+        self.game.state = "GAME"
+        self.seed = seed
+        self.player = player
+        self.inputs = 0
+        self.recorder = None
+        if REPLAY_DIR:
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            self.recorder = ReplayRecorder(os.path.join(REPLAY_DIR, f"{session_id}.replay"), seed, mode)
+
+    def step(self):
+        if self.game.sim.finished:
+            return
+        self.game.update_game(self.inputs)
+        if self.game.won and not self.game.game_over:
+            # The game scored itself, so a replay of it can't be scored again
+            from leaderboard import get_store
+            get_store().claim_seed(self.seed, self.player, self.game.mode)
+        if self.recorder:
+            self.recorder.record(self.inputs)
+            if self.game.sim.finished:
+                from replay import OUTCOME_LOST, OUTCOME_WON
+                self.recorder.finish(OUTCOME_LOST if self.game.game_over else OUTCOME_WON)
+                self.recorder = None
+
+    def close(self):
+        if self.recorder:
+            self.recorder.close()
+
+    def get_state(self):
+        game = self.game
+        return {
+            'mode': game.mode,
+            'ticks': game.sim.ticks,
+            'elapsed_ms': game.sim.elapsed_ms,
+            'lives': game.lives,
+            'stars_collected': game.stars_collected,
+            'game_over': game.game_over,
+            'won': game.won,
+            'player': list(game.player.rect.topleft),
+            'potions': [list(potion.rect.topleft) for potion in game.potions],
+            'walls': [list(wall.rect.topleft) for wall in game.walls],
+            'lava_pieces': len(game.player.lava_trail),
+        }
+
+    def memory(self):
+        """Bytes held by this session alone, by part (images, fonts and text are shared per worker)"""
+        game = self.game
+        player = game.player
+        width, height = player.lava_mask.get_size()
+        report = {
+            'lava_trail': player.lava_trail.nbytes,
+            'lava_mask': width * height // 8,
+            'screen': surface_bytes(game.screen),
+            'lava_layer': surface_bytes(game.renderer.lava_layer),
+            'objects': sum(sys.getsizeof(obj) for obj in [player, *game.walls, *game.potions]),
+        }
+        report['total'] = sum(report.values())
+        return report
+
+    def get_frame(self):
+        """Draw the current frame and return it as PNG bytes"""
+        import pygame
+
+        self.game.draw_game()
+        data = BytesIO()
+        pygame.image.save(self.game.screen, data, "frame.png")
+        return data.getvalue()
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+class WorkerSessions:
+    """The sessions of one worker, ticked together as a single TickScheduler game.
+
+    update_game steps every session with its own inputs; draw_game, which
+    the scheduler skips on ticks that had to catch up, captures frames for
+    watched sessions. Encoding happens on the encoder's threads.
+    """
+    def __init__(self, tick_rate):
+        from streaming import FrameEncoder
+        from profiling import profiler
+
+        self.profiler = profiler
+        self.sessions = {}
+        self.viewers = {}  # Session id -> number of open streams
+        self.spectators = {}  # Session id -> number of tile-delta spectators
+        self.broadcasts = {}  # Session id -> DeltaBroadcast shared by its spectators
+        self.encoder = FrameEncoder()
+        self.capture_every = max(1, round(tick_rate / STREAM_FPS))
+        self.ticks = 0
+
+    def update_game(self, inputs):
+        # A profiled frame runs from one tick to the next, so it includes any capture in between
+        self.profiler.end_frame()
+        self.profiler.begin_frame()
+        for session in self.sessions.values():
+            session.step()
+        self.ticks += 1
+
+    def draw_game(self):
+        if not (self.viewers or self.spectators) or self.ticks % self.capture_every:
+            return
+        for session_id in self.viewers.keys() | self.spectators.keys():
+            game = self.sessions[session_id].game
+            game.draw_game()
+            if session_id in self.viewers:
+                self.encoder.submit(session_id, game.screen)
+            if session_id in self.spectators:
+                self.broadcasts[session_id].submit(game.screen)
+        self.profiler.mark('draw')
+
+    def handle(self, command, args):
+        """Run one command from the SessionPool and return its result"""
+        from frame_delta import DeltaBroadcast
+        from text_cache import get_text_cache
+
+        sessions = self.sessions
+        if command == 'create':
+            session_id, mode, seed, player = args
+            sessions[session_id] = Session(session_id, mode, seed, player)
+        elif command == 'input':
+            session_id, inputs = args
+            sessions[session_id].inputs = inputs
+        elif command == 'state':
+            return sessions[args[0]].get_state()
+        elif command == 'frame':
+            return sessions[args[0]].get_frame()
+        elif command == 'memory':
+            return sessions[args[0]].memory()
+        elif command == 'end':
+            sessions.pop(args[0]).close()
+            self.viewers.pop(args[0], None)
+            self.spectators.pop(args[0], None)
+            self.broadcasts.pop(args[0], None)
+            self.encoder.discard(args[0])
+        elif command == 'watch':
+            session_id, delta = args
+            if session_id not in sessions:
+                raise KeyError(session_id)
+            self.viewers[session_id] = self.viewers.get(session_id, 0) + delta
+            if self.viewers[session_id] <= 0:
+                del self.viewers[session_id]
+                self.encoder.discard(session_id)
+        elif command == 'latest_frame':
+            session_id, after = args
+            if session_id not in sessions:
+                raise KeyError(session_id)
+            return self.encoder.latest_frame(session_id, after)
+        elif command == 'spectate':
+            session_id, delta = args
+            if session_id not in sessions:
+                raise KeyError(session_id)
+            self.spectators[session_id] = self.spectators.get(session_id, 0) + delta
+            if self.spectators[session_id] <= 0:
+                del self.spectators[session_id]
+                self.broadcasts.pop(session_id, None)
+            elif session_id not in self.broadcasts:
+                self.broadcasts[session_id] = DeltaBroadcast(self.encoder.pool)
+        elif command == 'deltas':
+            session_id, after = args
+            if session_id not in self.broadcasts:
+                raise KeyError(session_id)
+            return self.broadcasts[session_id].packets_after(after)
+        elif command == 'stats':
+            broadcasts = self.broadcasts.values()
+            return {
+                'sessions': len(sessions),
+                'streams': sum(self.viewers.values()),
+                'spectators': sum(self.spectators.values()),
+                'delta_bytes_sent': sum(b.bytes_sent for b in broadcasts),
+                'delta_frames_dropped': sum(b.frames_dropped for b in broadcasts),
+                'session_bytes': sum(session.memory()['total'] for session in sessions.values()),
+                'text_cache_bytes': get_text_cache().stats()['bytes'],
+                'profile': self.profiler.summary() if self.profiler.enabled else None,
+                **self.encoder.stats(),
+            }
+        else:
+            raise ValueError(f"unknown command {command!r}")
+        return None
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.encoder.shutdown()
+
+def worker_main(conn, tick_rate):
+    """Tick every session of this worker at tick_rate, answering requests in between"""
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    import pygame
+    pygame.init()
+    # Images are converted to the display format, so a (tiny) display is needed
+    pygame.display.set_mode((1, 1))
+
+    from profiling import profiler
+    profiler.enabled = PROFILE_WORKERS
+    asyncio.run(serve_worker(conn, tick_rate))
+    conn.close()
+
+async def serve_worker(conn, tick_rate):
+    """Drive the worker's sessions from a TickScheduler; requests are answered between ticks"""
+    from scheduler import TickScheduler
+
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    worker = WorkerSessions(tick_rate)
+    scheduler = TickScheduler(tick_rate)
+    game_id = scheduler.add(worker)
+
+    def answer():
+        try:
+            command, *args = conn.recv()
+        except EOFError:  # The pool is gone
+            command = 'stop'
+        if command == 'stop':
+            loop.remove_reader(conn.fileno())
+            stopped.set()
+            return
+        try:
+            result = worker.handle(command, args)
+            if command == 'stats':
+                ticks = scheduler.stats()[game_id]
+                result.update({
+                    'ticks': ticks['ticks'],
+                    'skipped_ticks': ticks['dropped_ticks'],
+                    'skipped_frames': ticks['skipped_frames'],
+                    'tick_lag_avg_ms': ticks['lag_mean_ms'],
+                    'tick_lag_max_ms': ticks['lag_max_ms'],
+                    'tick_jitter_ms': ticks['jitter_ms'],
+                    'tick_error': ticks['error'],
+                })
+            conn.send(('ok', result))
+        except KeyError as e:
+            conn.send(('missing', str(e)))
+        except Exception as e:
+            conn.send(('error', repr(e)))
+
+    loop.add_reader(conn.fileno(), answer)
+    await stopped.wait()
+    await scheduler.stop()
+    worker.close()
+
+class SessionPool:
+    """Game sessions sharded across worker processes that tick them at a fixed rate"""
+    def __init__(self, workers=None, tick_rate=SESSION_TICK_RATE):
+        self.worker_count = workers or os.cpu_count() or 1
+        self.tick_rate = tick_rate
+        self.workers = []
+        self.locks = []
+        self.connections = []
+        self.session_workers = {}  # Session id -> worker index
+        self.lock = threading.Lock()
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        for _ in range(self.worker_count):
+            parent_conn, child_conn = context.Pipe()
+            worker = context.Process(target=worker_main, args=(child_conn, self.tick_rate), daemon=True)
+            worker.start()
+            self.workers.append(worker)
+            self.connections.append(parent_conn)
+            self.locks.append(threading.Lock())
+
+    def stop(self):
+        for conn, lock in zip(self.connections, self.locks):
+            with lock:
+                conn.send(('stop',))
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.workers.clear()
+        self.connections.clear()
+        self.locks.clear()
+        self.session_workers.clear()
+
+    def request(self, worker, *message):
+        """Send a command to a worker and wait for its answer"""
+        with self.locks[worker]:
+            self.connections[worker].send(message)
+            status, result = self.connections[worker].recv()
+        if status == 'missing':
+            raise KeyError(result)
+        if status == 'error':
+            raise RuntimeError(result)
+        return result
+
+    def worker_for(self, session_id):
+        with self.lock:
+            return self.session_workers[session_id]
+
+    def create_session(self, mode="NORMAL", seed=None, player="player"):
+        """Start a game on the least loaded worker and return its id"""
+        if mode not in ("NORMAL", "BLIND"):
+            raise ValueError(f"unknown mode {mode!r}")
+        # Seeds come straight from request JSON; bool is an int subclass
+        if seed is not None and (type(seed) is not int or not 0 <= seed < 2 ** 63):
+            raise ValueError(f"seed must be an integer from 0 to 2**63 - 1, not {seed!r}")
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            counts = [0] * self.worker_count
+            for worker in self.session_workers.values():
+                counts[worker] += 1
+            worker = counts.index(min(counts))
+            self.session_workers[session_id] = worker
+        try:
+            self.request(worker, 'create', session_id, mode, seed, str(player))
+        except Exception:
+            with self.lock:
+                del self.session_workers[session_id]
+            raise
+        return session_id
+
+    def send_input(self, session_id, inputs):
+        """Set the INPUT_* bitmask applied on every tick until the next input"""
+        # Inputs come straight from request JSON; bool is an int subclass
+        if type(inputs) is not int or not 0 <= inputs <= 15:
+            raise ValueError(f"inputs must be an INPUT_* bitmask from 0 to 15, not {inputs!r}")
+        self.request(self.worker_for(session_id), 'input', session_id, inputs)
+
+    def get_state(self, session_id):
+        return self.request(self.worker_for(session_id), 'state', session_id)
+
+    def get_frame(self, session_id):
+        """Return the session's current frame as PNG bytes"""
+        return self.request(self.worker_for(session_id), 'frame', session_id)
+
+    def memory(self, session_id):
+        """Return the bytes held by a session, by part"""
+        return self.request(self.worker_for(session_id), 'memory', session_id)
+
+    def watch(self, session_id, watching=True):
+        """Start (or stop) capturing frames of a session for a viewer"""
+        self.request(self.worker_for(session_id), 'watch', session_id, 1 if watching else -1)
+
+    def latest_frame(self, session_id, after=0):
+        """Return (sequence, encoded bytes) of the newest streamed frame newer than after, or None"""
+        return self.request(self.worker_for(session_id), 'latest_frame', session_id, after)
+
+    def spectate(self, session_id, watching=True):
+        """Start (or stop) tile-delta encoding of a session for a spectator"""
+        self.request(self.worker_for(session_id), 'spectate', session_id, 1 if watching else -1)
+
+    def deltas(self, session_id, after=0):
+        """Return (latest sequence, tile-delta packets after sequence after)"""
+        return self.request(self.worker_for(session_id), 'deltas', session_id, after)
+
+    def end_session(self, session_id):
+        worker = self.worker_for(session_id)
+        self.request(worker, 'end', session_id)
+        with self.lock:
+            del self.session_workers[session_id]
+
+    def stats(self):
+        """Return per-worker session counts and tick lag"""
+        return [dict(worker=i, **self.request(i, 'stats')) for i in range(len(self.workers))]
@@ -0,0 +1,293 @@
+from array import array
+from bisect import bisect_right
+import pygame
+from constants import *
+from broadphase import WallGrid
+from profiling import profiler
+
+# pygame.Rect and pygame.mask work without a display, so everything in this
+# module runs headless: no window, no keyboard and no real-time clock.
+
+class LavaTrail:
+    """Lava piece positions in typed arrays, 4 bytes per piece instead of a tuple each.
+
+    With compress, a straight run of pieces the same step apart is kept as
+    one segment (start, step, count), so a long straight walk costs a few
+    bytes in total. Indexing then takes a binary search over the segments.
+    """
+    __slots__ = ('compress', 'points', 'xs', 'ys', 'steps_x', 'steps_y', 'counts', 'starts', 'length')
+
+    def __init__(self, compress=LAVA_TRAIL_COMPRESS):
+        self.compress = compress
+        self.clear()
+
+    def clear(self):
+        self.points = array('h')  # x, y, x, y, ... when not compressing
+        # Segments when compressing
+        self.xs = array('h')
+        self.ys = array('h')
+        self.steps_x = array('b')
+        self.steps_y = array('b')
+        self.counts = array('I')
+        self.starts = array('I')  # Index of each segment's first piece
+        self.length = 0
+
+    def append(self, position):
+        x, y = position
+        if not self.compress:
+            self.points.extend(position)
+        elif self.length and self.extends_segment(x, y):
+            self.counts[-1] += 1
+        else:
+            self.xs.append(x)
+            self.ys.append(y)
+            self.steps_x.append(0)
+            self.steps_y.append(0)
+            self.counts.append(1)
+            self.starts.append(self.length)
+        self.length += 1
+
+    def extends_segment(self, x, y):
+        """Whether (x, y) continues the last segment, fixing its step if it has one piece"""
+        last_x, last_y = self[-1]
+        step_x, step_y = x - last_x, y - last_y
+        if self.counts[-1] == 1:
+            if not (-128 <= step_x < 128 and -128 <= step_y < 128):
+                return False
+            self.steps_x[-1], self.steps_y[-1] = step_x, step_y
+            return True
+        return step_x == self.steps_x[-1] and step_y == self.steps_y[-1]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("lava trail index out of range")
+        if not self.compress:
+            return self.points[2 * index], self.points[2 * index + 1]
+        segment = len(self.starts) - 1 if index >= self.starts[-1] else bisect_right(self.starts, index) - 1
+        offset = index - self.starts[segment]
+        return (self.xs[segment] + offset * self.steps_x[segment],
+                self.ys[segment] + offset * self.steps_y[segment])
+
+    def __iter__(self):
+        if not self.compress:
+            points = self.points
+            for i in range(0, len(points), 2):
+                yield points[i], points[i + 1]
+            return
+        for x, y, step_x, step_y, count in zip(self.xs, self.ys, self.steps_x, self.steps_y, self.counts):
+            for offset in range(count):
+                yield x + offset * step_x, y + offset * step_y
+
+    @property
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in (self.points, self.xs, self.ys, self.steps_x,
+                                                 self.steps_y, self.counts, self.starts))
+
+class WallBody:
+    """Position and collision shape of an obstacle"""
+    __slots__ = ('rect', 'collision_rect')
+
+    def __init__(self, x, y):
+        self.rect = pygame.Rect(x, y, WALL_SIZE, WALL_SIZE)
+
+        # Create smaller collision rect
+        shrink = 12
+        self.collision_rect = self.rect.inflate(-shrink*2, -shrink*2)
+
+class PotionBody:
+    """Position and collision shape of a collectible star/potion"""
+    __slots__ = ('rect', 'collision_rect')
+
+    def __init__(self, x, y):
+        self.rect = pygame.Rect(x, y, POTION_SIZE, POTION_SIZE)
+
+        # Create smaller collision rect for better gameplay
+        shrink = 15
+        self.collision_rect = self.rect.inflate(-shrink*2, -shrink*2)
+
+# Masks that never change, shared by every player
+LAVA_PIECE_MASK = pygame.mask.Mask((LAVA_SIZE, LAVA_SIZE), fill=True)
+HITBOX_MASK = pygame.mask.Mask((PLAYER_SIZE - PLAYER_SIZE//2, PLAYER_SIZE - PLAYER_SIZE//2), fill=True)
+
+class PlayerBody:
+    """Player position, movement and lava trail, without images or input"""
+    __slots__ = ('rect', 'speed', 'bounds', 'lava_trail', 'trail_resets', 'lava_mask', 'lava_piece_mask',
+                 'hitbox_mask', 'invulnerable', 'invulnerable_timer')
+
+    def __init__(self, x, y):
+        self.rect = pygame.Rect(x, y, PLAYER_SIZE, PLAYER_SIZE)
+        self.speed = 5
+        self.bounds = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.lava_trail = LavaTrail()
+        self.trail_resets = 0  # Lets renderers notice the trail was cleared
+        # Occupancy mask of lava pieces older than the grace window
+        self.lava_mask = pygame.mask.Mask((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.lava_piece_mask = LAVA_PIECE_MASK
+        self.hitbox_mask = HITBOX_MASK
+        self.invulnerable = False
+        self.invulnerable_timer = 0
+
+    def move(self, inputs, wall_rects):
+        """Move by an INPUT_* bitmask, staying in bounds and out of walls"""
+        old_pos = self.rect.copy()
+        moved = False
+
+        # Handle movement
+        if inputs & INPUT_LEFT:
+            self.rect.x -= self.speed
+            moved = True
+        if inputs & INPUT_RIGHT:
+            self.rect.x += self.speed
+            moved = True
+        if inputs & INPUT_UP:
+            self.rect.y -= self.speed
+            moved = True
+        if inputs & INPUT_DOWN:
+            self.rect.y += self.speed
+            moved = True
+
+        # Keep player in bounds
+        self.rect.clamp_ip(self.bounds)
+
+        # Check wall collisions
+        if self.rect.collidelist(wall_rects) != -1:
+            self.rect = old_pos
+            moved = False
+
+        # Add lava trail if moved
+        if moved and not self.invulnerable:
+            self.add_lava_trail()
+        return moved
+
+    def start_invulnerability(self, now):
+        """Start invulnerability period"""
+        self.invulnerable = True
+        self.invulnerable_timer = now + 1000  # 1 second
+
+    def add_lava_trail(self):
+        """Add new lava piece to trail"""
+        center = self.rect.center
+        lava_pos = (center[0] - LAVA_SIZE//2, center[1] - LAVA_SIZE//2)
+
+        if not self.lava_trail or self.distance_to_last_lava(center[0], center[1]) > LAVA_SPACING:
+            self.lava_trail.append(lava_pos)
+            # Stamp the piece that just left the grace window (last 10 pieces)
+            if len(self.lava_trail) > LAVA_GRACE_PIECES:
+                self.lava_mask.draw(self.lava_piece_mask, self.lava_trail[-LAVA_GRACE_PIECES - 1])
+
+    def clear_lava_trail(self):
+        """Remove the whole lava trail"""
+        self.lava_trail.clear()
+        self.lava_mask.clear()
+        self.trail_resets += 1
+
+    def check_lava_collision(self):
+        """Check if player hits their own lava trail"""
+        if len(self.lava_trail) <= LAVA_GRACE_PIECES:  # Ignore if trail is too short
+            return False
+
+        # Only the pixels under the player's hitbox are tested, so the cost
+        # doesn't grow with the length of the trail
+        player_center = self.rect.inflate(-PLAYER_SIZE//2, -PLAYER_SIZE//2)
+        return self.lava_mask.overlap(self.hitbox_mask, player_center.topleft) is not None
+
+    def distance_to_last_lava(self, x, y):
+        """Calculate distance to last lava piece"""
+        if not self.lava_trail:
+            return float('inf')
+        last_lava = self.lava_trail[-1]
+        return ((x - (last_lava[0] + LAVA_SIZE // 2)) ** 2 +
+                (y - (last_lava[1] + LAVA_SIZE // 2)) ** 2) ** 0.5
+
+class Simulation:
+    """The rules of one game, advanced one fixed tick at a time.
+
+    Movement comes from an INPUT_* bitmask and time from either the tick
+    count (FIXED_TICK_MS per tick) or an injected clock returning
+    milliseconds, so the same rules run in the window and headless.
+    """
+    def __init__(self, player, walls, potions, clock=None):
+        self.player = player
+        self.walls = walls
+        self.wall_rects = [wall.rect for wall in walls]
+        self.wall_grid = WallGrid(self.wall_rects)
+        self._navigation = None
+        self.potions = potions
+        self.clock = clock
+        self.start_time = clock() if clock else 0
+        self.ticks = 0
+        self.elapsed_ms = 0
+        self.lives = 1
+        self.stars_collected = 0
+        self.game_over = False
+        self.won = False
+
+    @classmethod
+    def new_game(cls, seed=None, clock=None):
+        """Create a headless game on the first level of LevelGenerator(seed)"""
+        from level_gen import LevelGenerator
+
+        walls, spawn, potions = LevelGenerator(seed).next_level()
+        return cls(PlayerBody(*spawn),
+                   [WallBody(x, y) for x, y in walls],
+                   [PotionBody(x, y) for x, y in potions],
+                   clock)
+
+    @property
+    def navigation(self):
+        """NavGrid of this level, built on first use"""
+        if self._navigation is None:
+            from navigation import NavGrid
+            self._navigation = NavGrid(self.wall_rects)
+        return self._navigation
+
+    @property
+    def finished(self):
+        return self.game_over or self.won
+
+    def now(self):
+        """Milliseconds since the game started"""
+        if self.clock:
+            return self.clock() - self.start_time
+        return self.ticks * FIXED_TICK_MS
+
+    def walls_near(self, rect):
+        """Wall rects the player at rect could run into this tick"""
+        speed = self.player.speed
+        return self.wall_grid.query(rect.inflate(speed * 2, speed * 2))
+
+    def step(self, inputs):
+        """Advance the game by one tick"""
+        if self.game_over or self.won:
+            return
+
+        self.ticks += 1
+        self.elapsed_ms = self.now()
+        player = self.player
+
+        if player.invulnerable and self.elapsed_ms >= player.invulnerable_timer:
+            player.invulnerable = False
+        player.move(inputs, self.walls_near(player.rect))
+        profiler.mark('move')
+
+        if player.check_lava_collision():
+            self.lives -= 1
+            if self.lives <= 0:
+                self.game_over = True
+            else:
+                player.start_invulnerability(self.elapsed_ms)
+                player.clear_lava_trail()
+        profiler.mark('lava')
+
+        for potion in self.potions[:]:
+            if player.rect.colliderect(potion.collision_rect):
+                self.potions.remove(potion)
+                self.stars_collected += 1
+                if self.stars_collected >= 3:
+                    self.won = True
+        profiler.mark('potions')
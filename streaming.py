@@ -0,0 +1,95 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import pygame
+from constants import *
+
+class FrameEncoder:
+    """Encodes captured frames on a bounded thread pool.
+
+    Each stream (usually a session id) has at most one frame being encoded;
+    a frame captured while the previous one is still encoding is dropped
+    instead of queued, so a slow encoder never holds up the game tick and
+    memory never piles up. Viewers only ever get the newest encoded frame.
+    """
+    def __init__(self, threads=STREAM_ENCODER_THREADS, image_format=STREAM_FORMAT):
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="frame-encoder")
+        self.image_format = image_format
+        self.lock = threading.Lock()
+        self.busy = set()
+        self.latest = {}  # Stream key -> (sequence number, encoded bytes)
+        self.encoded = 0
+        self.dropped = 0
+        self.skipped_by_viewers = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def submit(self, key, surface):
+        """Queue surface for encoding; returns False if the frame was dropped"""
+        with self.lock:
+            if key in self.busy:
+                self.dropped += 1
+                return False
+            self.busy.add(key)
+
+        # The one copy needed to hand the pixels to another thread; the
+        # encoder wraps it with frombuffer without copying again
+        pixels = pygame.image.tobytes(surface, "RGB")
+        self.pool.submit(self.encode, key, pixels, surface.get_size(), time.perf_counter())
+        return True
+
+    def encode(self, key, pixels, size, captured_at):
+        try:
+            image = pygame.image.frombuffer(pixels, size, "RGB")
+            data = BytesIO()
+            pygame.image.save(image, data, "frame." + self.image_format)
+            latency = time.perf_counter() - captured_at
+            with self.lock:
+                if key in self.busy:  # Not discarded while encoding
+                    sequence = self.latest[key][0] + 1 if key in self.latest else 1
+                    self.latest[key] = (sequence, data.getvalue())
+                self.encoded += 1
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+        finally:
+            with self.lock:
+                self.busy.discard(key)
+
+    def latest_frame(self, key, after=0):
+        """Return (sequence, bytes) of the newest frame if it is newer than after"""
+        with self.lock:
+            frame = self.latest.get(key)
+            if frame is None or frame[0] <= after:
+                return None
+            if after:
+                self.skipped_by_viewers += frame[0] - after - 1
+            return frame
+
+    def discard(self, key):
+        with self.lock:
+            self.latest.pop(key, None)
+            self.busy.discard(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'frames_encoded': self.encoded,
+                'frames_dropped': self.dropped,
+                'frames_skipped_by_viewers': self.skipped_by_viewers,
+                'encode_latency_avg_ms': self.latency_total / self.encoded * 1000 if self.encoded else 0.0,
+                'encode_latency_max_ms': self.latency_max * 1000,
+            }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+def multipart_frames(next_frame, image_format=STREAM_FORMAT, boundary=b'frame'):
+    """Yield a multipart/x-mixed-replace body from next_frame() until it returns None"""
+    content_type = b'image/jpeg' if image_format == 'jpg' else b'image/' + image_format.encode()
+    while True:
+        data = next_frame()
+        if data is None:
+            return
+        yield (b'--' + boundary + b'\r\nContent-Type: ' + content_type +
+               b'\r\nContent-Length: ' + str(len(data)).encode() + b'\r\n\r\n' + data + b'\r\n')
@@ -0,0 +1,34 @@
+import pygame
+import pytest
+import assets
+from env import init_headless
+
+IMAGE = "assets/potion2.png"
+SIZE = (30, 30)
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    init_headless()
+    monkeypatch.setattr(assets, "ASSET_CACHE_DIR", str(tmp_path))
+    assets.clear()
+    yield tmp_path
+    assets.clear()
+
+def test_blob_round_trip(cache_dir):
+    image = assets.load_image(IMAGE, SIZE)
+    cached = assets.read_cached(IMAGE, SIZE, True)
+    assert pygame.image.tobytes(cached, "RGBA") == pygame.image.tobytes(image, "RGBA")
+
+@pytest.mark.parametrize("length", [0, 10, None], ids=["empty", "truncated", "header only"])
+def test_damaged_blob_is_a_miss(cache_dir, length):
+    image = assets.load_image(IMAGE, SIZE)
+    path = assets.cache_path(IMAGE, SIZE, True)
+    with open(path, 'r+b') as f:
+        f.truncate(assets.CACHE_HEADER.size if length is None else length)
+    assert assets.read_cached(IMAGE, SIZE, True) is None
+
+    # Loading falls back to the PNG and rewrites the blob
+    assets.clear()
+    reloaded = assets.load_image(IMAGE, SIZE)
+    assert pygame.image.tobytes(reloaded, "RGBA") == pygame.image.tobytes(image, "RGBA")
+    assert assets.read_cached(IMAGE, SIZE, True) is not None
@@ -0,0 +1,40 @@
+import numpy
+import pytest
+from batch_sim import BatchSimulation
+from level_gen import LevelGenerator
+from simulation import PlayerBody, PotionBody, Simulation, WallBody
+
+GAMES = 150
+TICKS = 3000
+
+def new_simulation(seed, hard):
+    walls, spawn, potions = LevelGenerator(seed).next_level(hard=hard)
+    return Simulation(PlayerBody(*spawn),
+                      [WallBody(x, y) for x, y in walls],
+                      [PotionBody(x, y) for x, y in potions])
+
+def state(sim):
+    return (sim.player.rect.x, sim.player.rect.y, sim.lives, sim.stars_collected, sim.game_over, sim.won)
+
+def batch_state(batch, i):
+    return (batch.x[i], batch.y[i], batch.lives[i], batch.stars_collected[i], batch.game_over[i], batch.won[i])
+
+@pytest.mark.parametrize("hard", [False, True], ids=["normal", "hard"])
+def test_batch_matches_simulation(hard):
+    sims = [new_simulation(seed, hard) for seed in range(GAMES)]
+    batch = BatchSimulation.from_simulations(sims)
+    rng = numpy.random.default_rng(0)
+    inputs = rng.integers(0, 16, GAMES)
+
+    mismatches = []
+    for tick in range(TICKS):
+        # Hold each input for a while, so players travel and lay long trails
+        inputs = numpy.where(rng.random(GAMES) < 0.05, rng.integers(0, 16, GAMES), inputs)
+        for sim, value in zip(sims, inputs):
+            sim.step(int(value))
+        batch.step(inputs)
+        mismatches.extend((tick, i) for i, sim in enumerate(sims) if state(sim) != batch_state(batch, i))
+
+    assert mismatches == []
+    # Most games should have ended by now, so collisions and deaths were compared too
+    assert batch.finished.sum() > GAMES // 2
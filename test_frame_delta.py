@@ -0,0 +1,107 @@
+import numpy
+import pygame
+import pytest
+from frame_delta import (DeltaBroadcast, TileDeltaDecoder, TileDeltaEncoder, frame_pixels,
+                         pack_packets, unpack_packets)
+
+WIDTH, HEIGHT = 200, 160
+
+class InlinePool:
+    """Runs submitted work straight away, so the tests don't depend on thread timing"""
+    def submit(self, function, *args):
+        function(*args)
+
+def frames(count, seed=0, noise=True):
+    """BGRX frames of a background with a square moving across, like a player over a level"""
+    rng = numpy.random.default_rng(seed)
+    if noise:
+        background = rng.integers(0, 256, (HEIGHT, WIDTH, 4), dtype=numpy.uint8)
+    else:
+        # Smooth, like the real background, which JPEG handles well
+        background = numpy.zeros((HEIGHT, WIDTH, 4), dtype=numpy.uint8)
+        background[..., 0] = numpy.linspace(0, 255, WIDTH, dtype=numpy.uint8)
+        background[..., 1] = numpy.linspace(0, 255, HEIGHT, dtype=numpy.uint8)[:, None]
+    background[..., 3] = 0
+    for i in range(count):
+        frame = background.copy()
+        x, y = (i * 7) % (WIDTH - 30), (i * 3) % (HEIGHT - 30)
+        frame[y:y + 30, x:x + 30] = (0, 200, 255, 0)
+        if i % 10 == 0:
+            frame[rng.integers(HEIGHT), rng.integers(WIDTH), :3] = rng.integers(0, 256, 3)
+            background = frame.copy()  # Some changes stay, like lava
+        yield frame
+
+def rgb(frame):
+    return frame[..., 2::-1]
+
+def test_lossless_round_trip_is_pixel_identical():
+    encoder = TileDeltaEncoder(tile_size=40, keyframe_interval=8, image_format="png")
+    decoder = TileDeltaDecoder()
+    keyframes = 0
+    for frame in frames(30):
+        packet, keyframe = encoder.encode(frame)
+        keyframes += keyframe
+        assert numpy.array_equal(decoder.apply(packet), rgb(frame))
+    assert keyframes == 4  # Packets 1, 9, 17 and 25
+
+def test_jpeg_round_trip_stays_close():
+    encoder = TileDeltaEncoder(tile_size=40, keyframe_interval=8, image_format="jpg")
+    decoder = TileDeltaDecoder()
+    for frame in frames(30, noise=False):
+        error = numpy.abs(decoder.apply(encoder.encode(frame)[0]).astype(int) - rgb(frame))
+        # Lossy, but errors don't build up from one delta to the next
+        assert error.mean() < 2
+
+def test_unchanged_frame_sends_no_tiles():
+    encoder = TileDeltaEncoder(tile_size=40)
+    frame = next(frames(1))
+    encoder.encode(frame)
+    delta, keyframe = encoder.encode(frame.copy())
+    assert not keyframe
+    assert delta[-2:] == b"\0\0"  # Header only: no tiles and no image
+
+def test_surface_round_trip():
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    surface.fill((10, 20, 30))
+    pygame.draw.circle(surface, (250, 100, 0), (70, 90), 25)
+    decoder = TileDeltaDecoder()
+    decoder.apply(TileDeltaEncoder(tile_size=40, image_format="png").encode(frame_pixels(surface))[0])
+    assert pygame.image.tobytes(decoder.to_surface(), "RGB") == pygame.image.tobytes(surface, "RGB")
+
+def test_decoder_rejects_a_gap():
+    encoder = TileDeltaEncoder(tile_size=40)
+    decoder = TileDeltaDecoder()
+    stream = frames(3)
+    decoder.apply(encoder.encode(next(stream))[0])
+    encoder.encode(next(stream))  # Lost
+    with pytest.raises(ValueError):
+        decoder.apply(encoder.encode(next(stream))[0])
+
+def test_late_spectator_starts_from_the_latest_keyframe():
+    broadcast = DeltaBroadcast(InlinePool())
+    broadcast.encoder = TileDeltaEncoder(tile_size=40, keyframe_interval=10, image_format="png")
+    early, early_at = TileDeltaDecoder(), 0
+    late, late_at = TileDeltaDecoder(), None
+
+    for i, frame in enumerate(frames(35)):
+        assert broadcast.submit(pygame.image.frombuffer(frame.tobytes(), (WIDTH, HEIGHT), "BGRA"))
+        early_at, packets = broadcast.packets_after(early_at)
+        for packet in unpack_packets(pack_packets(packets)):
+            early.apply(packet)
+        assert numpy.array_equal(early.frame, rgb(frame))
+
+        if i == 24:
+            # Joins mid-stream: gets the keyframe of packet 21 and the deltas after it
+            late_at, packets = broadcast.packets_after(0)
+            assert len(packets) == 5
+            for packet in packets:
+                late.apply(packet)
+            assert numpy.array_equal(late.frame, rgb(frame))
+
+    # Having fallen behind by more than a keyframe, the late spectator restarts from the latest one
+    late_at, packets = broadcast.packets_after(late_at)
+    assert late_at == 35 and len(packets) == 5
+    for packet in packets:
+        late.apply(packet)
+    assert numpy.array_equal(late.frame, early.frame)
+    assert broadcast.frames_dropped == 0
@@ -0,0 +1,66 @@
+import asyncio
+import pygame
+from env import init_headless
+from scheduler import TickScheduler
+
+GAMES = 50
+
+def offscreen_game(seed):
+    from game import Game
+    from leaderboard import NullScores
+    from level_gen import LevelGenerator
+
+    game = Game(screen=pygame.Surface((800, 600)), levels=LevelGenerator(seed), scores=NullScores())
+    game.mode = "NORMAL"
+    game.state = "GAME"
+    game.reset_game()
+    return game
+
+class FailingGame:
+    """Raises on its third tick"""
+    def __init__(self):
+        self.ticks = 0
+
+    def update_game(self, inputs):
+        self.ticks += 1
+        if self.ticks == 3:
+            raise RuntimeError("broken level")
+
+    def draw_game(self):
+        pass
+
+def test_many_games_on_one_loop():
+    init_headless()
+    games = [offscreen_game(seed) for seed in range(GAMES)]
+
+    async def run():
+        scheduler = TickScheduler(tick_rate=60, render=False)
+        ids = [scheduler.add(game) for game in games]
+        for i, game_id in enumerate(ids):
+            scheduler.set_input(game_id, 2 if i % 2 else 8)
+        await asyncio.sleep(0.5)
+        return await scheduler.stop()
+
+    stats = asyncio.run(run())
+    assert len(stats) == GAMES
+    # About 30 ticks each; allow for a slow machine, but every game must keep up roughly
+    assert all(game['ticks'] >= 10 and game['error'] is None for game in stats.values())
+    assert all(game.sim.ticks == stats[i]['ticks'] for i, game in enumerate(games))
+
+def test_failing_game_is_recorded_and_the_others_continue():
+    init_headless()
+    healthy = offscreen_game(1)
+    frames = []
+
+    async def run():
+        scheduler = TickScheduler(tick_rate=60)
+        broken_id = scheduler.add(FailingGame())
+        healthy_id = scheduler.add(healthy, frames.append)
+        await asyncio.sleep(0.3)
+        assert scheduler.stats()[broken_id]['error'] == "RuntimeError('broken level')"
+        return broken_id, healthy_id, await scheduler.stop()
+
+    broken_id, healthy_id, stats = asyncio.run(run())
+    assert stats[broken_id]['ticks'] == 2
+    assert stats[healthy_id]['ticks'] > 3 and stats[healthy_id]['error'] is None
+    assert frames
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from constants import *
+
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces and wrapped text layouts"""
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.layouts = {}
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        """Same as font.render, but reuses the surface if it was rendered before.
+
+        The returned surface is shared, so callers must not draw onto it.
+        """
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.surfaces[key] = font.render(text, antialias, color)
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)  # Drop the least recently used
+        return surface
+
+    def wrap(self, font, text, max_width):
+        """Split text into lines no wider than max_width, remembering the result"""
+        key = (font, text, max_width)
+        lines = self.layouts.get(key)
+        if lines is not None:
+            return lines
+
+        words = text.split()
+        lines = []
+        current_line = []
+
+        for word in words:
+            current_line.append(word)
+            test_line = ' '.join(current_line)
+            if font.size(test_line)[0] > max_width:
+                lines.append(' '.join(current_line[:-1]))
+                current_line = [word]
+        lines.append(' '.join(current_line))
+
+        self.layouts[key] = lines
+        return lines
+
+    def stats(self):
+        """Return hit/miss counters, the current cache size and the bytes of its surfaces"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.surfaces),
+                'bytes': sum(surface.get_pitch() * surface.get_height() for surface in self.surfaces.values())}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+# One cache per process, shared by every game in it (they all draw on one thread)
+_cache = None
+
+def get_text_cache():
+    global _cache
+    if _cache is None:
+        _cache = TextCache()
+    return _cache
@@ -0,0 +1,77 @@
+import pygame
+from constants import *
+
+class Widget:
+    """A surface rendered once and the screen rect it's drawn at, with optional children.
+
+    Widgets with an action are clickable: hit() returns the action of the
+    topmost one under a point, using only the stored rects.
+    """
+    __slots__ = ('surface', 'rect', 'action', 'children')
+
+    def __init__(self, surface=None, rect=None, action=None, children=()):
+        self.surface = surface
+        self.rect = rect if rect is not None or surface is None else surface.get_rect()
+        self.action = action
+        self.children = list(children)
+
+    def add(self, widget):
+        self.children.append(widget)
+        return widget
+
+    def blits(self, out):
+        """Collect (surface, rect) pairs for this widget and its children, back to front"""
+        if self.surface is not None:
+            out.append((self.surface, self.rect))
+        for child in self.children:
+            child.blits(out)
+        return out
+
+    def hit(self, position):
+        """Action of the topmost clickable widget at position, or None"""
+        for child in reversed(self.children):
+            action = child.hit(position)
+            if action is not None:
+                return action
+        if self.action is not None and self.rect.collidepoint(position):
+            return self.action
+        return None
+
+class Screen(Widget):
+    """Root of a widget tree: laid out once, then drawn with one blit per widget.
+
+    key records what the layout was built from (a story page, the best
+    times shown), so the owner can tell when it has to be rebuilt.
+    """
+    __slots__ = ('key', 'draw_list')
+
+    def __init__(self, key=None, children=()):
+        super().__init__(children=children)
+        self.key = key
+        self.draw_list = None
+
+    def draw(self, screen):
+        # Flattened on the first draw; the tree doesn't change after layout
+        if self.draw_list is None:
+            self.draw_list = self.blits([])
+        screen.blits(self.draw_list, doreturn=False)
+
+def label(surface, **anchor):
+    """Widget for an already rendered surface (text or image), placed with get_rect keywords"""
+    return Widget(surface, surface.get_rect(**anchor))
+
+def button(rect, text, fill, action, border=None, shade=None):
+    """Clickable filled rectangle, rendered once, with text centered on it.
+
+    shade draws a second fill over all but the bottom 5 pixels, and border
+    a 2 pixel outline, like the restart button. The text is a child, as
+    it may be wider than the button.
+    """
+    rect = pygame.Rect(rect)
+    surface = pygame.Surface(rect.size)
+    surface.fill(fill)
+    if shade is not None:
+        pygame.draw.rect(surface, shade, (0, 0, rect.width, rect.height - 5))
+    if border is not None:
+        pygame.draw.rect(surface, border, surface.get_rect(), 2)
+    return Widget(surface, rect, action, [label(text, center=rect.center)])
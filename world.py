@@ -0,0 +1,208 @@
+import math
+import random
+from array import array
+from collections import deque
+import numpy
+import pygame
+from constants import *
+from player import Player
+from simulation import LAVA_PIECE_MASK, PlayerBody, PotionBody, Simulation
+
+CHUNK = WORLD_CHUNK_SIZE
+
+class Chunk:
+    """One square of the world: its walls and the lava that reached it.
+
+    Lava is kept as the local positions of its pieces (4 bytes each); the
+    collision mask is only built while the player is near the chunk.
+    """
+    __slots__ = ('origin', 'wall_rects', 'lava', 'mask')
+
+    def __init__(self, origin, wall_rects):
+        self.origin = origin
+        self.wall_rects = wall_rects
+        self.lava = array('h')  # x, y of every lava piece touching the chunk, relative to origin
+        self.mask = None
+
+    def lava_mask(self, piece_mask):
+        if self.mask is None:
+            self.mask = pygame.mask.Mask((CHUNK, CHUNK))
+            for i in range(0, len(self.lava), 2):
+                self.mask.draw(piece_mask, (self.lava[i], self.lava[i + 1]))
+        return self.mask
+
+class World:
+    """A scrolling world of chunks, generated from the seed as they are first needed.
+
+    Walls of a chunk depend only on the seed and the chunk's coordinates, so
+    chunks without lava can be dropped when the player leaves and rebuilt
+    identically when they come back.
+    """
+    def __init__(self, seed=None, chunks_wide=WORLD_CHUNKS_WIDE, chunks_high=WORLD_CHUNKS_HIGH):
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.chunks_wide = chunks_wide
+        self.chunks_high = chunks_high
+        self.rect = pygame.Rect(0, 0, chunks_wide * CHUNK, chunks_high * CHUNK)
+        self.chunks = {}
+        self.near_keys = None
+        self.near_walls = []
+        self.lava_resets = 0
+        self.lava_piece_mask = LAVA_PIECE_MASK
+
+        # Spawn in the middle, on the 5 pixel movement lattice
+        self.spawn = ((self.rect.centerx - PLAYER_SIZE // 2) // 5 * 5,
+                      (self.rect.centery - PLAYER_SIZE // 2) // 5 * 5)
+        self.potions = self.place_potions(numpy.random.default_rng(self.seed))
+        # Walls are never generated over the spawn or a potion
+        self.reserved = [pygame.Rect(self.spawn, (PLAYER_SIZE, PLAYER_SIZE)).inflate(LAVA_SIZE, LAVA_SIZE)]
+        self.reserved.extend(pygame.Rect(position, (POTION_SIZE, POTION_SIZE)) for position in self.potions)
+
+    def place_potions(self, rng):
+        """Three potions WORLD_STAR_DISTANCE from the spawn and MIN_STAR_DISTANCE apart"""
+        bounds = self.rect.inflate(-POTION_SIZE, -POTION_SIZE)
+        potions = []
+        while len(potions) < 3:
+            angle = rng.uniform(0, 2 * math.pi)
+            distance = rng.uniform(*WORLD_STAR_DISTANCE)
+            x = min(max(int(self.spawn[0] + distance * math.cos(angle)), bounds.left), bounds.right)
+            y = min(max(int(self.spawn[1] + distance * math.sin(angle)), bounds.top), bounds.bottom)
+            if all(math.dist((x, y), other) >= MIN_STAR_DISTANCE for other in potions):
+                potions.append((x, y))
+        return potions
+
+    def chunk(self, key):
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = self.generate_chunk(key)
+        return chunk
+
+    def generate_chunk(self, key):
+        cx, cy = key
+        origin = (cx * CHUNK, cy * CHUNK)
+        rng = numpy.random.default_rng([self.seed, cx, cy])
+        wall_rects = []
+        for _ in range(rng.poisson(WORLD_WALLS_PER_CHUNK)):
+            # Walls lie inside their chunk, so a chunk's walls are all in one place
+            x, y = rng.integers(0, CHUNK - WALL_SIZE + 1, size=2)
+            rect = pygame.Rect(origin[0] + int(x), origin[1] + int(y), WALL_SIZE, WALL_SIZE)
+            if rect.collidelist(self.reserved) == -1:
+                wall_rects.append(rect)
+        return Chunk(origin, wall_rects)
+
+    def chunk_keys(self, rect):
+        """Keys of the chunks rect touches"""
+        left = max(rect.left // CHUNK, 0)
+        top = max(rect.top // CHUNK, 0)
+        right = min((rect.right - 1) // CHUNK, self.chunks_wide - 1)
+        bottom = min((rect.bottom - 1) // CHUNK, self.chunks_high - 1)
+        return [(cx, cy) for cy in range(top, bottom + 1) for cx in range(left, right + 1)]
+
+    def walls_near(self, rect):
+        """Wall rects of the chunks around rect"""
+        keys = self.chunk_keys(rect.inflate(2 * CHUNK // 10, 2 * CHUNK // 10))
+        # The player stays in the same chunks for many ticks in a row
+        if keys != self.near_keys:
+            self.near_keys = keys
+            self.near_walls = [wall for key in keys for wall in self.chunk(key).wall_rects]
+        return self.near_walls
+
+    def add_lava(self, position):
+        """Record a lava piece in every chunk it touches"""
+        for key in self.chunk_keys(pygame.Rect(position, (LAVA_SIZE, LAVA_SIZE))):
+            chunk = self.chunk(key)
+            local = (position[0] - chunk.origin[0], position[1] - chunk.origin[1])
+            chunk.lava.extend(local)
+            if chunk.mask is not None:
+                chunk.mask.draw(self.lava_piece_mask, local)
+
+    def lava_hits(self, rect, mask):
+        """Whether mask, placed at rect, overlaps any recorded lava"""
+        for key in self.chunk_keys(rect):
+            chunk = self.chunk(key)
+            if chunk.lava and chunk.lava_mask(self.lava_piece_mask).overlap(
+                    mask, (rect.x - chunk.origin[0], rect.y - chunk.origin[1])) is not None:
+                return True
+        return False
+
+    def clear_lava(self):
+        for chunk in self.chunks.values():
+            chunk.lava = array('h')
+            chunk.mask = None
+        self.lava_resets += 1
+
+    def release(self, keep):
+        """Free what chunks away from the keep rect don't need: masks, and chunks with no lava at all"""
+        near = set(self.chunk_keys(keep))
+        for key, chunk in list(self.chunks.items()):
+            if key not in near:
+                if chunk.lava:
+                    chunk.mask = None
+                else:
+                    del self.chunks[key]
+
+    def camera(self, center, size):
+        """Top-left of a size view centered on center, kept inside the world"""
+        width, height = size
+        return (min(max(center[0] - width // 2, 0), self.rect.width - width),
+                min(max(center[1] - height // 2, 0), self.rect.height - height))
+
+class WorldBody(PlayerBody):
+    """Player body in a World: only the newest lava pieces are kept, older ones live in the chunks"""
+    # No __slots__ here: WorldPlayer also inherits Player's, and two sets would conflict
+    def __init__(self, world, x, y):
+        super().__init__(x, y)
+        self.world = world
+        self.bounds = world.rect.copy()
+        self.lava_mask = None
+        self.lava_trail = deque(maxlen=LAVA_GRACE_PIECES + 1)
+        self.lava_count = 0
+
+    def add_lava_trail(self):
+        center = self.rect.center
+        if not self.lava_trail or self.distance_to_last_lava(center[0], center[1]) > LAVA_SPACING:
+            self.lava_trail.append((center[0] - LAVA_SIZE//2, center[1] - LAVA_SIZE//2))
+            self.lava_count += 1
+            # Hand the piece that just left the grace window to the world
+            if self.lava_count > LAVA_GRACE_PIECES:
+                self.world.add_lava(self.lava_trail[0])
+
+    def clear_lava_trail(self):
+        self.lava_trail.clear()
+        self.lava_count = 0
+        self.world.clear_lava()
+        self.trail_resets += 1
+
+    def check_lava_collision(self):
+        if self.lava_count <= LAVA_GRACE_PIECES:
+            return False
+        return self.world.lava_hits(self.rect.inflate(-PLAYER_SIZE//2, -PLAYER_SIZE//2), self.hitbox_mask)
+
+    def recent_lava(self):
+        """Lava pieces still in the grace window, which no chunk holds yet"""
+        trail = list(self.lava_trail)
+        return trail[1:] if self.lava_count > LAVA_GRACE_PIECES else trail
+
+class WorldPlayer(WorldBody, Player):
+    """WorldBody with the astronaut's images, for drawing"""
+
+class WorldSimulation(Simulation):
+    """Simulation rules in a World: walls come from the chunks around the player"""
+    def __init__(self, world, player, potions, clock=None):
+        super().__init__(player, [], potions, clock)
+        self.world = world
+
+    @classmethod
+    def new_world(cls, seed=None, clock=None):
+        """Create a headless game in a new World"""
+        world = World(seed)
+        return cls(world, WorldBody(world, *world.spawn),
+                   [PotionBody(x, y) for x, y in world.potions], clock)
+
+    def walls_near(self, rect):
+        return self.world.walls_near(rect)
+
+    def step(self, inputs):
+        super().step(inputs)
+        # Let go of chunks the player has left, about once a second
+        if self.ticks % 60 == 0:
+            self.world.release(self.player.rect.inflate(WINDOW_WIDTH * 2, WINDOW_HEIGHT * 2))